@@ -6,32 +6,225 @@ Developed with assistance from Autodesk Assistant (AI).
 
 260519: First released version.
 260521: Added support for contiguous co-surface faces. Improved debug output and added graphics for face indices.
+261016: Added per-body face attribute cache so each face is classified once per session.
+        Flood fill now runs on an integer-indexed CSR face adjacency graph.
+        Hover preview reads precomputed region labels instead of running a BFS.
+        Edge tangency normals are fetched per face with getNormalsAtPoints.
+        Changing the tangent tolerance re-thresholds cached edge measurements instead of rebuilding.
+        Body caches now survive between runs and are checked against a design-change signature.
+        Hover preview is budgeted; large regions are completed in idle time slices.
+        Edge classification of the design's bodies starts in the background when the command opens.
+        Added flood_fill_batch, a UI-free entry point returning the regions of many seeds at once.
+        G2 continuity of a tangent edge is sampled the first time a fill needs it.
+        G2 sampling of many edges is batched per face and tested with NumPy when available.
+        Debug output looks face indices up in the body's cached face graph.
+        Debug lineage tree is rendered iteratively in one log call and can be written to a JSON/JSONL file.
+        Face index labels are drawn only for the previewed region, in one reused graphics group per body.
+        Added phase timers and evaluator call counts, shown in the dialog in Debug mode and kept in a rolling log.
+        Hovering inside the last previewed region reuses it; fills during a mouse sweep are coalesced.
+        Completed regions are kept in an LRU per (body, seed, mode, tolerance), bounded by total faces.
+        Face graphs intern face tokens once; edge face pairs are flat int arrays and edge tokens are not kept.
+        Edge classification is split into an API extraction stage and API-free numeric functions
+        (g2_metrics_from_samples, classify_edges) that can be mapped over a thread or process pool.
+        Per-edge measurements of large bodies are kept in an on-disk cache and reused when a part is reopened.
+        Added Fast/Balanced/Exact edge sampling: sample counts follow face types and edge length, with early exit.
+        Edges between planes, cylinders, cones, spheres and tori are classified from surface parameters, not sampled.
+        NURBS face concavity is a vote over a grid of curvatures fetched in one call, with a confidence value.
+        Highlight collections are created in one call; the locked region is selected in bulk,
+        or in chunks across custom events where that is not available, and the push is timed in the log.
 """
 
 import adsk
 import adsk.core as ac
 import adsk.fusion as af
+import collections
+import hashlib
+import json
+import logging
+import logging.handlers
 import math
+import mmap
+import os
+import struct
+import sys
+import time
 import traceback
+import types
+from array import array
+try:
+    import numpy as np
+except ImportError:  # not bundled with Fusion's Python
+    np = None
 
 _handlers = []
 _shared   = {}
 CUSTOM_EVENT_ID = 'faceFloodFillPostSelect'
+IDLE_EVENT_ID   = 'faceFloodFillIdle'
+
+# Hover preview budget; the rest of a region is filled in IDLE_SLICE_SECONDS slices
+PREVIEW_MAX_FACES   = 500
+PREVIEW_MAX_SECONDS = 0.03
+IDLE_SLICE_SECONDS  = 0.02
+# Hovers closer together than this are a sweep: their fills run in idle time, latest wins
+COALESCE_SECONDS    = 0.05
+# Pushing the locked region into the active selection face by face (when the bulk
+# assignment is not available) adds this many faces per custom event
+SELECT_CHUNK_FACES  = 1000
+
+# Debug: when set to a .json or .jsonl path, the lineage of every locked region is written there
+LINEAGE_FILE = ''
+# Debug face index labels: at most this many per region; our graphics groups' id prefix
+DEBUG_MAX_LABELS = 300
+GFX_ID_PREFIX    = 'faceFloodFill.faceIndex.'
+# Rolling log of per-invocation phase timings (see PhaseStats)
+PERF_LOG_FILE  = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'FaceFloodFill_perf.log')
+PERF_LOG_BYTES = 1 << 20
+# Edge sampling precision, one of PRECISIONS (see _sample_counts); the dialog can change it.
+# Edges whose normals differ by more than SHARP_EDGE_DEG at the midpoint are not sampled further.
+PRECISION  = 'balanced'
+PRECISIONS = ('fast', 'balanced', 'exact')
+EXACT_SAMPLE_SPACING = 0.5  # cm
+SHARP_EDGE_DEG       = 10.0
+# On-disk cache of per-edge measurements (see write_edge_cache); '' disables it.
+# Bodies with fewer edges are not cached; the least recently used files beyond the limit are removed.
+EDGE_CACHE_DIR       = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'FaceFloodFill_cache')
+EDGE_CACHE_MIN_EDGES = 1000
+EDGE_CACHE_MAX_FILES = 64
+# NURBS face concavity: curvature sampled on a grid of NURBS_CURV_GRID x NURBS_CURV_GRID
+# parameter points; the majority sign must lead by this share of the samples.
+NURBS_CURV_GRID       = 3
+NURBS_MIN_CONFIDENCE  = 0.5
 
 _app = ac.Application.get()
 _ui  = _app.userInterface
 
+# Per-body caches that outlive run(): Fusion reloads this module for every run,
+# so they are parked on a module object in sys.modules. See _body_cache.
+# They hold plain data only (API objects, arrays, dicts, tuples): instances of
+# this module's classes would keep running the code and globals of the load
+# that made them. Bump _WARM_FORMAT when the layout changes.
+_WARM_FORMAT = 1
+_warm = sys.modules.setdefault('_faceFloodFill_warm', types.ModuleType('_faceFloodFill_warm'))
+if getattr(_warm, 'format', None) != _WARM_FORMAT:
+    _warm.format  = _WARM_FORMAT
+    _warm.bodies  = collections.OrderedDict()  # body token -> {'doc', 'signature', 'graph', 'faces'}
+    _warm.regions = collections.OrderedDict()  # RegionCache key -> face indices
+_WARM_BODIES = 16
+# Completed regions kept by RegionCache, in faces summed over all regions
+REGION_CACHE_FACES = 200000
+
 
 def _dbg(msg):
     if _shared.get("debug"):
         _app.log(msg)
 
 
+class PhaseStats:
+    """
+    Wall time and evaluator call counts per phase, accumulated until reset().
+    Phases nest; time is charged to the innermost phase only, so the phase
+    times add up to the instrumented total. count() charges API round trips
+    to the innermost phase ('other' outside any phase).
+    Phases: graph, classify, g2, concavity, bfs, labels, lookup, highlight,
+    select, disk, and idle:<task> for the idle work not covered by a nested phase.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.seconds = collections.Counter()
+        self.calls   = collections.Counter()
+        self._stack  = []
+        self._t      = 0.0
+
+    def phase(self, name):
+        return _Phase(self, name)
+
+    def count(self, n=1):
+        self.calls[self._stack[-1] if self._stack else 'other'] += n
+
+    def _enter(self, name):
+        now = time.perf_counter()
+        if self._stack:
+            self.seconds[self._stack[-1]] += now - self._t
+        self._stack.append(name)
+        self._t = now
+
+    def _exit(self):
+        now = time.perf_counter()
+        self.seconds[self._stack.pop()] += now - self._t
+        self._t = now
+
+    def rows(self):
+        """[(phase, ms, calls)] in descending time."""
+        names = set(self.seconds) | set(self.calls)
+        return sorted(((n, self.seconds[n] * 1000.0, self.calls[n]) for n in names),
+                      key=lambda row: -row[1])
+
+    def text(self):
+        """Multi-line table for the dialog."""
+        rows  = self.rows()
+        lines = [f'{n:<12}{ms:9.1f} ms{calls:8d} calls' for n, ms, calls in rows]
+        lines.append(f'{"total":<12}{sum(r[1] for r in rows):9.1f} ms'
+                     f'{sum(r[2] for r in rows):8d} calls')
+        return '\n'.join(lines)
+
+    def line(self):
+        """One-line summary for the rolling log."""
+        return ' '.join(f'{n}={ms:.1f}ms/{calls}' for n, ms, calls in self.rows())
+
+
+class _Phase:
+    __slots__ = ('stats', 'name')
+    def __init__(self, stats, name):
+        self.stats = stats
+        self.name  = name
+    def __enter__(self):
+        self.stats._enter(self.name)
+    def __exit__(self, *exc):
+        self.stats._exit()
+
+
+_perf = PhaseStats()
+
+
+def _perf_logger():
+    """Logger appending to PERF_LOG_FILE, rotated at PERF_LOG_BYTES with 3 backups."""
+    logger = logging.getLogger('FaceFloodFill.perf')
+    if not logger.handlers:
+        handler = logging.handlers.RotatingFileHandler(
+            PERF_LOG_FILE, maxBytes=PERF_LOG_BYTES, backupCount=3)
+        handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+    return logger
+
+
+def _report_perf(event, n_faces, extra=''):
+    """
+    In Debug mode show _perf in the dialog's timing box. Locks and selection
+    pushes are always appended to the rolling log, hovers only in Debug mode.
+    extra: more 'key=value' text for the log line.
+    """
+    debug = _shared.get('debug')
+    if debug and 'inputs' in _shared:
+        _shared['inputs'].itemById('perf').text = _perf.text()
+    if debug or event in ('lock', 'select'):
+        try:
+            _perf_logger().info(f'{event} mode={_shared.get("mode")} '
+                                f'precision={_shared.get("precision", PRECISION)} '
+                                f'faces={n_faces} {extra + " " if extra else ""}{_perf.line()}')
+        except OSError:
+            pass  # read-only script folder: dialog only
+
+
 def is_face_concave(face: af.BRepFace):
     """
     Returns True if concave, False if convex, None if planar/saddle.
     Uses analytic dot-product for analytic surface types,
-    and corrected curvature sign for NurbsSurface.
+    and a vote of corrected curvature signs for NurbsSurface (see nurbs_concavity).
     """
     ST   = ac.SurfaceTypes
     geom = face.geometry
@@ -44,20 +237,7 @@ def is_face_concave(face: af.BRepFace):
     # -- NurbsSurface ---------------------------------------------------------
     # negative mean => CONVEX, positive mean => CONCAVE
     elif st == ST.NurbsSurfaceType:
-        srfEvaluator = face.evaluator
-        prange = srfEvaluator.parametricRange()
-        param  = ac.Point2D.create(
-            (prange.minPoint.x + prange.maxPoint.x) / 2.0,
-            (prange.minPoint.y + prange.maxPoint.y) / 2.0)
-        ok, _, maxCurv, minCurv = srfEvaluator.getCurvature(param)
-        if not ok:
-            raise RuntimeError("getCurvature failed.")
-        if face.isParamReversed:
-            maxCurv, minCurv = -maxCurv, -minCurv
-        mean = (maxCurv + minCurv) / 2.0
-        if abs(mean) < 1e-10:
-            return None
-        return mean > 0
+        return nurbs_concavity(face)[1]
 
     # -- All analytic types ---------------------------------------------------
     # Outward face normal dot radial/center vector:
@@ -66,6 +246,7 @@ def is_face_concave(face: af.BRepFace):
     else:
         pt = face.pointOnFace
         ok, normal = face.evaluator.getNormalAtPoint(pt)
+        _perf.count()
         if not ok:
             raise RuntimeError("getNormalAtPoint failed.")
 
@@ -94,6 +275,49 @@ def is_face_concave(face: af.BRepFace):
         return normal.dotProduct(ref) < 0
 
 
+def nurbs_concavity(face, grid=NURBS_CURV_GRID):
+    """
+    (curved, concavity, confidence) of a NURBS face from its principal
+    curvatures at the centres of grid x grid equal cells of its parametric
+    range (the midpoint among them for odd grid), fetched with one
+    getCurvatures call; per point only if the batch fails.
+    Every sample that evaluates votes by its mean curvature, sign-corrected for
+    isParamReversed: positive concave, negative convex, near zero abstains.
+      curved      any sample has non-zero curvature
+      concavity   True (concave) / False (convex) by majority; None when the
+                  confidence is below NURBS_MIN_CONFIDENCE or nothing evaluated
+      confidence  (majority - minority votes) / evaluated samples, 0.0 to 1.0
+    """
+    ev     = face.evaluator
+    prange = ev.parametricRange()
+    u0, v0 = prange.minPoint.x, prange.minPoint.y
+    du, dv = (prange.maxPoint.x - u0) / grid, (prange.maxPoint.y - v0) / grid
+    params = [ac.Point2D.create(u0 + du * (i + 0.5), v0 + dv * (j + 0.5))
+              for j in range(grid) for i in range(grid)]
+    _perf.count(2)
+    curvs  = _face_points_batch(ev, params, ev.getCurvature, ev.getCurvatures)
+    sense  = -1.0 if face.isParamReversed else 1.0
+    _perf.count()
+
+    n_ok   = 0
+    curved = False
+    votes  = [0, 0]  # convex, concave
+    for ok, _, max_curv, min_curv in curvs:
+        if not ok:
+            continue
+        n_ok += 1
+        curved = curved or abs(max_curv) > 1e-10 or abs(min_curv) > 1e-10
+        mean = sense * (max_curv + min_curv) / 2.0
+        if abs(mean) >= 1e-10:
+            votes[mean > 0] += 1
+    if not n_ok:
+        return False, None, 0.0
+    confidence = abs(votes[1] - votes[0]) / n_ok
+    if confidence < NURBS_MIN_CONFIDENCE:
+        return curved, None, confidence
+    return curved, votes[1] > votes[0], confidence
+
+
 def _axis_radial(pt, axis_origin, axis_vector):
     """Radial vector from an axis to a point (axis component removed)."""
     to_pt = ac.Vector3D.create(
@@ -132,9 +356,181 @@ def is_curved_face(face):
         (bbox.minPoint.x + bbox.maxPoint.x) / 2.0,
         (bbox.minPoint.y + bbox.maxPoint.y) / 2.0)
     ok, _, max_curv, min_curv = ev.getCurvature(param)
+    _perf.count(2)
     return ok and (abs(max_curv) > 1e-10 or abs(min_curv) > 1e-10)
 
 
+FaceInfo = collections.namedtuple('FaceInfo', 'surface_type curved concavity point confidence')
+
+
+def face_info(face, table=None):
+    """
+    Cached FaceInfo(surface_type, curved, concavity, point, confidence) of face.
+    concavity is as is_face_concave, or None for uncurved faces.
+    point is face.pointOnFace.
+    confidence is 1.0 except for NURBS faces, whose curvature and concavity
+    come from one nurbs_concavity grid and carry its vote confidence.
+    table: the per-body dict from _face_table; looked up from face.body when omitted.
+    """
+    if table is None:
+        table = _face_table(face.body)
+    tok  = face.entityToken
+    info = table.get(tok)
+    if info is not None:
+        return FaceInfo._make(info)
+    st = face.geometry.surfaceType
+    if st == ac.SurfaceTypes.NurbsSurfaceType:
+        curved, concavity, confidence = nurbs_concavity(face)
+    else:
+        curved     = is_curved_face(face)
+        concavity  = is_face_concave(face) if curved else None
+        confidence = 1.0
+    info = FaceInfo(st, curved, concavity, face.pointOnFace, confidence)
+    table[tok] = tuple(info)
+    return info
+
+
+def _face_table(body):
+    """
+    Per-body {face_token: FaceInfo fields as a plain tuple}, filled lazily by
+    face_info. Kept while the design is unchanged.
+    """
+    return _body_cache(body)['faces']
+
+
+def _document_key(doc):
+    if doc is None:
+        return None
+    try:
+        return doc.creationId
+    except:
+        return doc.name
+
+
+def _design_signature(body):
+    """
+    Cheap fingerprint of the design state a body cache was built from:
+    timeline marker position and length, body face/edge counts and area.
+    """
+    timeline = None
+    design   = af.Design.cast(_app.activeProduct)
+    if design:
+        try:
+            tl = design.timeline
+            timeline = (tl.markerPosition, tl.count)
+        except:
+            pass  # direct modeling design: no timeline
+    return (timeline, body.faces.count, body.edges.count, round(body.area, 9))
+
+
+def _body_cache(body, body_tok=None):
+    """
+    Long-lived cache entry of body, kept across command invocations and runs:
+      'graph'  FaceGraph.state of the body's graph (see _entry_graph), or None
+      'faces'  _face_table for face_info
+    The entry is checked against _design_signature once per command invocation
+    (the design cannot change while the command runs) and replaced if stale.
+    Every call marks it most recently used; beyond _WARM_BODIES entries the least
+    recently used is written to the edge cache and dropped, also from the
+    invocation's checked entries.
+    Entries of closed documents are dropped when the command is next opened.
+    """
+    if body_tok is None:
+        body_tok = body.entityToken
+    checked = _shared.setdefault('_checked_bodies', {})
+    entry   = checked.get(body_tok)
+    if entry is None:
+        signature = _design_signature(body)
+        entry     = _warm.bodies.get(body_tok)
+        if entry is None or entry['signature'] != signature or not _entry_valid(entry):
+            entry = {'doc': _document_key(_app.activeDocument), 'signature': signature,
+                     'graph': None, 'faces': {}}
+            _warm.bodies[body_tok] = entry
+            _forget_body(body_tok)
+        checked[body_tok] = entry
+    _warm.bodies.move_to_end(body_tok)
+    while len(_warm.bodies) > _WARM_BODIES:
+        tok, old = _warm.bodies.popitem(last=False)
+        if checked.pop(tok, None) is not None:
+            try:
+                _save_edge_cache(tok, old)  # G2 samples taken this invocation
+            except:
+                pass
+        _forget_body(tok)
+    return entry
+
+
+def _entry_valid(entry):
+    """False if the API objects held by a cache entry no longer resolve."""
+    state = entry['graph']
+    try:
+        return state is None or not state['faces'] or state['faces'][0].isValid
+    except:
+        return False
+
+
+def _forget_body(body_tok):
+    """Drop the cached regions and the FaceGraph object of the body with token body_tok."""
+    _regions.drop_body(body_tok)
+    _graphs.pop(body_tok, None)
+
+
+def drop_document_caches(open_docs=None):
+    """
+    Drop cached bodies of documents that are no longer open. Called when the
+    command is created: Fusion ends a running command before a document closes.
+    """
+    if open_docs is None:
+        open_docs = {_document_key(d) for d in _app.documents}
+        open_docs.add(_document_key(_app.activeDocument))
+    for tok in [t for t, e in _warm.bodies.items() if e['doc'] not in open_docs]:
+        del _warm.bodies[tok]
+        _forget_body(tok)
+    _shared.pop('_checked_bodies', None)
+
+
+class RegionCache:
+    """
+    LRU of completed flood-fill regions keyed by (body token, seed face index, mode, tol).
+    A region is stored as an array of face indices into the body's FaceGraph, so
+    the regions of a body are dropped together with its cache entry (_body_cache).
+    The faces summed over all regions are kept under max_faces.
+    lru: the OrderedDict to keep the regions in, e.g. one left by an earlier load.
+    """
+
+    def __init__(self, max_faces, lru=None):
+        self.max_faces = max_faces
+        self._lru      = lru if lru is not None else collections.OrderedDict()
+        self.n_faces   = sum(map(len, self._lru.values()))
+
+    def get(self, key):
+        """Face indices of the region stored under key, or None."""
+        order = self._lru.get(key)
+        if order is not None:
+            self._lru.move_to_end(key)
+        return order
+
+    def put(self, key, order):
+        """Store face indices order under key, evicting the least recently used regions."""
+        if len(order) > self.max_faces:
+            return
+        old = self._lru.pop(key, None)
+        if old is not None:
+            self.n_faces -= len(old)
+        self._lru[key] = order
+        self.n_faces  += len(order)
+        while self.n_faces > self.max_faces:
+            self.n_faces -= len(self._lru.popitem(last=False)[1])
+
+    def drop_body(self, body_tok):
+        """Forget every region of the body with token body_tok."""
+        for key in [k for k in self._lru if k[0] == body_tok]:
+            self.n_faces -= len(self._lru.pop(key))
+
+
+_regions = RegionCache(REGION_CACHE_FACES, _warm.regions)
+
+
 def _curv_ratio(c1, c2):
     """Relative curvature difference. Returns 0.0 when both are near-zero (co-planar)."""
     denom = max(abs(c1), abs(c2))
@@ -198,76 +594,1159 @@ def _is_g2_edge(edge, f1, f2, tangent_tol_cos):
     return True
 
 
-def build_edge_sets(body, tangent_tol_cos):
+G2_CURV_RATIO = 0.02
+
+
+def _sample_fractions(n):
     """
-    Build three disjoint sets of edge tokens: concave, convex, tangent.
-    tangent_tokens includes G1-tangent edges AND G2-continuous (co-surface) edges.
-    Starts from body.concaveEdges / body.convexEdges, then:
-      1. Promotes edges within tangent_tol to tangent_tokens (G1)
-      2. Promotes remaining concave/convex edges that are G2-continuous to tangent_tokens
-    Raises if the three sets do not account for all edges.
+    n parameter fractions along an edge, spread evenly between its ends:
+    1/(n+1) .. n/(n+1). For odd n the midpoint is one of them; it is listed
+    first so that the other samples can be skipped once it decides the edge.
     """
-    concave_tokens = {e.entityToken for e in body.concaveEdges}
-    convex_tokens  = {e.entityToken for e in body.convexEdges}
+    fracs = [i / (n + 1) for i in range(1, n + 1)]
+    if n % 2:
+        fracs.insert(0, fracs.pop(n // 2))
+    return fracs
 
-    overlap = concave_tokens & convex_tokens
-    if overlap:
-        raise RuntimeError(f'{len(overlap)} edges appear in both concave and convex sets')
 
-    tangent_tokens = set()
-    all_edges      = list(body.edges)
-    total          = len(all_edges)
+def _sample_counts(precision, nurbs, length=0.0):
+    """
+    (G1 samples, G2 samples) along an edge at precision, one of PRECISIONS.
+    nurbs: a face on either side is a NURBS surface; length: edge length in
+    cm, only used by 'exact'. Counts are odd, see _sample_fractions.
+      fast      1, 1
+      balanced  3, 3 along NURBS faces; 1, 3 between analytic faces
+      exact     3, 3 between analytic faces; along NURBS faces one sample
+                per EXACT_SAMPLE_SPACING of length, 5 to 9
+    """
+    if precision == 'fast':
+        return 1, 1
+    if not nurbs:
+        return (3 if precision == 'exact' else 1), 3
+    if precision == 'balanced':
+        return 3, 3
+    n = min(9, max(5, int(length / EXACT_SAMPLE_SPACING))) | 1
+    return n, n
+
+
+def _g2_metrics(edge, f1, f2, n_samples=3):
+    """
+    Tolerance-independent inputs of _is_g2_edge, sampled at n_samples points
+    (the same 3 points for the default):
+    (ok, max curvature ratio, min max-curvature direction dot).
+    ok is False where _is_g2_edge fails regardless of tolerance (evaluation
+    failure or surface type mismatch). The direction dot is 1.0 where no sample
+    has significant curvature on both sides.
+    The edge is G2 at tangent_tol_cos iff
+        ok and ratio <= G2_CURV_RATIO and dir_dot >= tangent_tol_cos.
+    Sampling stops once the ratio fails, which no tolerance can undo.
+    """
+    ev = edge.evaluator
+    _, t0, t1 = ev.getParameterExtents()
+    ST = ac.SurfaceTypes
+    ev1, ev2 = f1.evaluator, f2.evaluator
+    st1 = f1.geometry.surfaceType
+    st2 = f2.geometry.surfaceType
+    nurbs = ST.NurbsSurfaceType
+    if st1 != st2 and st1 != nurbs and st2 != nurbs:
+        return False, 0.0, 1.0
+
+    ratio   = 0.0
+    dir_min = 1.0
+    _perf.count()
+    for frac in _sample_fractions(n_samples):
+        _, pt = ev.getPointAtParameter(t0 + (t1 - t0) * frac)
+
+        ok1, _ = ev1.getNormalAtPoint(pt)
+        ok2, _ = ev2.getNormalAtPoint(pt)
+        _perf.count(3)
+        if not ok1 or not ok2:
+            return False, 0.0, 1.0
+
+        ok1p, param1 = ev1.getParameterAtPoint(pt)
+        ok2p, param2 = ev2.getParameterAtPoint(pt)
+        _perf.count(2)
+        if not ok1p or not ok2p:
+            return False, 0.0, 1.0
+
+        ok1c, tan1, maxC1, minC1 = ev1.getCurvature(param1)
+        ok2c, tan2, maxC2, minC2 = ev2.getCurvature(param2)
+        _perf.count(2)
+        if not ok1c or not ok2c:
+            return False, 0.0, 1.0
+
+        ratio = max(ratio, _curv_ratio(maxC1, maxC2), _curv_ratio(minC1, minC2))
+
+        if abs(maxC1) > 1e-10 and abs(maxC2) > 1e-10:
+            dir_dot = abs(tan1.x*tan2.x + tan1.y*tan2.y + tan1.z*tan2.z)
+            dir_min = min(dir_min, max(-1.0, min(1.0, dir_dot)))
+        if ratio > G2_CURV_RATIO:
+            break
+
+    return True, ratio, dir_min
 
-    # Build an edge -> faces lookup once
-    edge_faces = {}
-    for edge in all_edges:
-        edge_faces[edge.entityToken] = list(edge.faces)
 
-    for edge in all_edges:
-        tok   = edge.entityToken
-        faces = edge_faces[tok]
-        if len(faces) < 2:
+def _face_points_batch(ev, pts, single, plural):
+    """
+    Results of the SurfaceEvaluator method plural on all of pts, or of single
+    per point when the batch call fails. Returns [(ok, value...)] per point.
+    """
+    res = plural(pts)
+    _perf.count()
+    if res[0] and all(len(vals) == len(pts) for vals in res[1:]):
+        return [(True,) + vals for vals in zip(*res[1:])]
+    _perf.count(len(pts))
+    return [single(pt) for pt in pts]
+
+
+class G2Samples:
+    """
+    Everything _g2_metrics reads from the API for a list of edges, in plain
+    arrays that pickle cheaply, so g2_metrics_from_samples can run in a worker
+    thread or process. Filled by extract_g2_samples.
+    Per position k of edges: type_ok[k] is 0 where the surface types of the
+    two faces rule G2 out. Sample rows may come in any order and number per
+    edge: row r belongs to edge position row_edge[r], and per side s (0 or 1),
+    at i = 2*r + s, ok[i] is 1 where the normal, parameter and curvature
+    evaluated, max_c[i] and min_c[i] are the principal curvatures and
+    tan[3*i:3*i+3] the max-curvature direction.
+    """
+
+    def __init__(self, edges):
+        self.edges    = array('i', edges)
+        self.type_ok  = bytearray(len(edges))
+        self.row_edge = array('i')
+        self.ok       = bytearray()
+        self.max_c    = array('d')
+        self.min_c    = array('d')
+        self.tan      = array('d')
+
+    def add_rows(self, positions):
+        """Append zeroed rows for the edges at positions; returns the index of the first."""
+        first = len(self.row_edge)
+        n     = len(positions)
+        self.row_edge.extend(positions)
+        self.ok.extend(bytes(2 * n))
+        self.max_c.extend(array('d', [0.0]) * (2 * n))
+        self.min_c.extend(array('d', [0.0]) * (2 * n))
+        self.tan.extend(array('d', [0.0]) * (6 * n))
+        return first
+
+
+def extract_g2_samples(graph, edge_indices):
+    """
+    API stage of G2 classification: G2Samples of the edges edge_indices of graph,
+    at graph.g2_samples points per edge (see _sample_counts).
+    All midpoints are sampled first; the other points only of edges whose
+    midpoint did not already fail the curvature test. In each pass the
+    points of all edges are gathered first, then each face's normals,
+    parameters and curvatures are fetched with one plural call each.
+    """
+    samples = G2Samples(edge_indices)
+    nurbs   = ac.SurfaceTypes.NurbsSurfaceType
+    st      = {}
+    todo    = []  # (position, edge evaluator, t0, t1, faces)
+    for k, ei in enumerate(edge_indices):
+        f1, f2 = graph.edge_faces[2*ei], graph.edge_faces[2*ei + 1]
+        for fi in (f1, f2):
+            if fi not in st:
+                st[fi] = graph.faces[fi].geometry.surfaceType
+        if st[f1] != st[f2] and st[f1] != nurbs and st[f2] != nurbs:
             continue
-        f1, f2 = faces[0], faces[1]
-        ev = edge.evaluator
+        samples.type_ok[k] = 1
+        ev = graph.edges[ei].evaluator
         _, t0, t1 = ev.getParameterExtents()
-        _, pt     = ev.getPointAtParameter((t0 + t1) / 2.0)
-        ok1, n1   = f1.evaluator.getNormalAtPoint(pt)
-        ok2, n2   = f2.evaluator.getNormalAtPoint(pt)
-        if not ok1 or not ok2:
+        _perf.count(2)
+        todo.append((k, ev, t0, t1, (f1, f2)))
+
+    _g2_sample_pass(graph, samples, [(item, (0.5,)) for item in todo])
+    metrics = g2_metrics_from_samples(samples)
+    more    = []
+    for item in todo:
+        k = item[0]
+        n = graph.g2_samples[edge_indices[k]]
+        if n > 1 and metrics[0][k] and metrics[1][k] <= G2_CURV_RATIO:
+            more.append((item, _sample_fractions(n)[1:]))
+    if more:
+        _g2_sample_pass(graph, samples, more)
+    return samples
+
+
+def _g2_sample_pass(graph, samples, work):
+    """Add the rows of work, [((position, evaluator, t0, t1, faces), fractions)], to samples."""
+    by_face = {}  # face index -> ([points], [sample slot])
+    for (k, ev, t0, t1, faces), fracs in work:
+        params = [t0 + (t1 - t0) * frac for frac in fracs]
+        ok_p, pts = ev.getPointsAtParameters(params)
+        _perf.count()
+        if not ok_p or len(pts) != len(params):
+            pts = [ev.getPointAtParameter(t)[1] for t in params]
+            _perf.count(len(params))
+        first = samples.add_rows([k] * len(params))
+        for side, fi in enumerate(faces):
+            face_pts, slots = by_face.setdefault(fi, ([], []))
+            face_pts.extend(pts)
+            slots.extend(2 * (first + j) + side for j in range(len(params)))
+
+    ok, max_c, min_c, tan = samples.ok, samples.max_c, samples.min_c, samples.tan
+    for fi, (pts, slots) in by_face.items():
+        ev = graph.faces[fi].evaluator
+        normals = _face_points_batch(ev, pts, ev.getNormalAtPoint, ev.getNormalsAtPoints)
+        params  = _face_points_batch(ev, pts, ev.getParameterAtPoint, ev.getParametersAtPoints)
+        good    = [i for i, (n_res, p_res) in enumerate(zip(normals, params))
+                   if n_res[0] and p_res[0]]
+        curvs   = _face_points_batch(ev, [params[i][1] for i in good],
+                                     ev.getCurvature, ev.getCurvatures)
+        for i, (ok_c, t, kmax, kmin) in zip(good, curvs):
+            if not ok_c:
+                continue
+            slot = slots[i]
+            ok[slot]    = 1
+            max_c[slot] = kmax
+            min_c[slot] = kmin
+            tan[3*slot], tan[3*slot + 1], tan[3*slot + 2] = t.x, t.y, t.z
+
+
+def g2_metrics_from_samples(samples):
+    """
+    Numeric stage of G2 classification, without API calls: _g2_metrics of
+    every edge of samples (G2Samples) as lists (ok, ratio, dir_min) aligned
+    with samples.edges. The arithmetic is the same as _g2_metrics, so the
+    results are identical for the same sample points. Vectorized with numpy
+    when available.
+    """
+    n      = len(samples.edges)
+    n_rows = len(samples.row_edge)
+    if np is not None:
+        row_edge = np.frombuffer(samples.row_edge, dtype=np.int32)
+        ok    = np.frombuffer(samples.ok, dtype=np.uint8).reshape(n_rows, 2).astype(bool)
+        max_c = np.frombuffer(samples.max_c, dtype=np.float64).reshape(n_rows, 2)
+        min_c = np.frombuffer(samples.min_c, dtype=np.float64).reshape(n_rows, 2)
+        tan   = np.frombuffer(samples.tan, dtype=np.float64).reshape(n_rows, 2, 3)
+
+        def curv_ratio(c1, c2):  # _curv_ratio on arrays
+            denom = np.maximum(np.abs(c1), np.abs(c2))
+            with np.errstate(invalid='ignore', divide='ignore'):
+                r = np.abs(c1 - c2) / denom
+            return np.where(denom < 1e-10, 0.0, r)
+
+        ratio  = np.maximum(curv_ratio(max_c[:, 0], max_c[:, 1]),
+                            curv_ratio(min_c[:, 0], min_c[:, 1]))
+        t1, t2 = tan[:, 0], tan[:, 1]
+        dots   = np.abs(t1[:, 0]*t2[:, 0] + t1[:, 1]*t2[:, 1] + t1[:, 2]*t2[:, 2])
+        signif = (np.abs(max_c[:, 0]) > 1e-10) & (np.abs(max_c[:, 1]) > 1e-10)
+        dirs   = np.where(signif, np.clip(dots, -1.0, 1.0), 1.0)
+
+        bad     = np.bincount(row_edge, weights=~ok.all(axis=1), minlength=n)
+        ok_edge = np.frombuffer(samples.type_ok, dtype=np.uint8).astype(bool) & (bad == 0)
+        ratio_e = np.zeros(n)
+        dirs_e  = np.ones(n)
+        np.maximum.at(ratio_e, row_edge, ratio)
+        np.minimum.at(dirs_e, row_edge, dirs)
+        ratio_e = np.where(ok_edge, ratio_e, 0.0)
+        dirs_e  = np.where(ok_edge, dirs_e, 1.0)
+        return ok_edge.tolist(), ratio_e.tolist(), dirs_e.tolist()
+
+    max_c, min_c, tan = samples.max_c, samples.min_c, samples.tan
+    oks    = [bool(t) for t in samples.type_ok]
+    ratios = [0.0] * n
+    dirs   = [1.0] * n
+    for r, k in enumerate(samples.row_edge):
+        a, b = 2*r, 2*r + 1
+        if not (samples.ok[a] and samples.ok[b]):
+            oks[k] = False
+            continue
+        ratios[k] = max(ratios[k], _curv_ratio(max_c[a], max_c[b]),
+                        _curv_ratio(min_c[a], min_c[b]))
+        if abs(max_c[a]) > 1e-10 and abs(max_c[b]) > 1e-10:
+            dir_dot = abs(tan[3*a]*tan[3*b] + tan[3*a + 1]*tan[3*b + 1]
+                          + tan[3*a + 2]*tan[3*b + 2])
+            dirs[k] = min(dirs[k], max(-1.0, min(1.0, dir_dot)))
+    for k in range(n):
+        if not oks[k]:
+            ratios[k], dirs[k] = 0.0, 1.0
+    return oks, ratios, dirs
+
+
+# Edge class bit flags stored per edge in EdgeClasses.edge_class
+EDGE_CONCAVE = 1
+EDGE_CONVEX  = 2
+EDGE_TANGENT = 4
+EDGE_G2      = 8
+_EDGE_G2_PENDING = 16  # tangent edge whose G2 metrics have not been sampled yet
+
+# FaceGraph.g2_state values
+_G2_UNKNOWN = 0
+_G2_SAMPLED = 1
+_G2_FAILED  = 2
+
+_UNSET = object()
+
+_graphs = {}  # body token -> (graph state, FaceGraph) of this module load, see _entry_graph
+
+
+class FaceGraph:
+    """
+    Integer-indexed face adjacency of one body in CSR layout, plus the raw,
+    tolerance-independent edge measurements that edge classes are derived from.
+    Faces and edges are numbered 0..n in body.faces / body.edges order;
+    face_index interns face tokens to these numbers, edge tokens are not kept.
+    The neighbours of face i are adj_face[offsets[i]:offsets[i+1]], reached
+    across the edges at the same positions in adj_edge.
+    Per edge index:
+      edge_faces[2*ei], edge_faces[2*ei+1]
+                  indices of the faces on either side (-1 where missing)
+      base_class  EDGE_CONCAVE / EDGE_CONVEX as reported by the body
+      n_dot       dot of the two face normals where they differ most among the
+                  edge's G1 samples (NaN for boundary); its absolute value where
+                  analytic_normal_dot decides it
+      g2_samples  number of G2 sample points, see _sample_counts
+      g2_state, g2_ratio, g2_dir
+                  _g2_metrics results, from analytic_g2_metrics when the graph
+                  is built, else sampled the first time the edge is tangent
+    precision is the PRECISIONS entry the sample counts were chosen for.
+    classes(tol) thresholds these into an EdgeClasses view without API calls;
+    G2 metrics are sampled when a view first needs them for an edge.
+    Face concavity and the extrusion-cylinder test are fetched from the API on
+    first use and memoized, so repeated flood fills only touch integers.
+    token_checksum identifies the topology for the on-disk edge cache;
+    disk_sampled is the number of G2-sampled edges when it was last read or
+    written (-1 if never).
+    state() is the graph's plain data for the _warm store, from_state the
+    graph again; both share the arrays, which are filled in place.
+    """
+
+    def __init__(self, faces, face_tokens, face_index, edges, edge_faces,
+                 base_class, n_dot, face_table, token_checksum=None,
+                 precision=PRECISION, g2_samples=None):
+        n_edges = len(edges)
+        self.precision     = precision
+        self.g2_samples    = g2_samples if g2_samples is not None else bytearray([3]) * n_edges
+        self.faces         = faces
+        self.face_tokens   = face_tokens
+        self.face_index    = face_index
+        self.edges         = edges
+        self.edge_faces    = edge_faces
+        self.base_class    = base_class
+        self.n_dot         = n_dot
+        self.g2_state      = bytearray(n_edges)
+        self.g2_ratio      = array('d', [0.0]) * n_edges
+        self.g2_dir        = array('d', [1.0]) * n_edges
+        self.boundary      = edge_faces[1::2].count(-1)
+        self.token_checksum = token_checksum
+        self.disk_sampled  = -1
+        self._face_table   = face_table
+        self._concavity    = {}
+        self._extrusion    = {}
+        self._views        = {}
+
+        n_faces = len(faces)
+        degree  = [0] * n_faces
+        for a, b in zip(edge_faces[0::2], edge_faces[1::2]):
+            if b >= 0 and a != b:
+                degree[a] += 1
+                degree[b] += 1
+        offsets = array('i', [0]) * (n_faces + 1)
+        for i in range(n_faces):
+            offsets[i + 1] = offsets[i] + degree[i]
+        adj_face = array('i', [0]) * offsets[n_faces]
+        adj_edge = array('i', [0]) * offsets[n_faces]
+        fill     = array('i', offsets[:n_faces])
+        for ei, (a, b) in enumerate(zip(edge_faces[0::2], edge_faces[1::2])):
+            if b < 0 or a == b:
+                continue  # boundary or seam edge: no neighbour across it
+            adj_face[fill[a]] = b; adj_edge[fill[a]] = ei; fill[a] += 1
+            adj_face[fill[b]] = a; adj_edge[fill[b]] = ei; fill[b] += 1
+        self.offsets  = offsets
+        self.adj_face = adj_face
+        self.adj_edge = adj_edge
+
+    def state(self):
+        """Plain data of the graph: everything but its EdgeClasses views."""
+        state = dict(self.__dict__)
+        del state['_views']
+        return state
+
+    @classmethod
+    def from_state(cls, state):
+        """FaceGraph with the data of state, a FaceGraph.state of any module load."""
+        graph = cls.__new__(cls)
+        graph.__dict__.update(state)
+        graph._views = {}
+        return graph
+
+    def concavity(self, i):
+        """is_face_concave of face i for curved faces, else None. Memoized."""
+        conc = self._concavity.get(i, _UNSET)
+        if conc is _UNSET:
+            with _perf.phase('concavity'):
+                conc = face_info(self.faces[i], self._face_table).concavity
+            self._concavity[i] = conc
+        return conc
+
+    def is_extrusion(self, face_i, edge_i):
+        """is_extrusion_cylinder of face face_i across edge edge_i. Memoized."""
+        key = (face_i, edge_i)
+        res = self._extrusion.get(key)
+        if res is None:
+            with _perf.phase('concavity'):
+                res = is_extrusion_cylinder(self.faces[face_i], self.edges[edge_i])
+            self._extrusion[key] = res
+        return res
+
+    def sample_g2(self, edge_indices):
+        """Fill the G2 metrics of the given edges that have not been sampled yet."""
+        _drain(self.sample_g2_steps(edge_indices))
+
+    def sample_g2_steps(self, edge_indices, per_step=16):
+        """
+        Generator form of sample_g2; yields every per_step edges.
+        Several edges are sampled in chunks of 16 steps, by extract_g2_samples
+        followed by g2_metrics_from_samples.
+        """
+        if len(edge_indices) > 1:
+            todo  = [ei for ei in edge_indices if self.g2_state[ei] == _G2_UNKNOWN]
+            chunk = per_step * 16
+            for start in range(0, len(todo), chunk):
+                samples = extract_g2_samples(self, todo[start:start + chunk])
+                self.store_g2(samples, g2_metrics_from_samples(samples))
+                yield
+            return
+        for n_done, ei in enumerate(edge_indices):
+            if n_done % per_step == per_step - 1:
+                yield
+            if self.g2_state[ei] != _G2_UNKNOWN:
+                continue
+            ok, ratio, dir_dot = _g2_metrics(self.edges[ei], self.faces[self.edge_faces[2*ei]],
+                                             self.faces[self.edge_faces[2*ei + 1]],
+                                             self.g2_samples[ei])
+            self.g2_state[ei] = _G2_SAMPLED if ok else _G2_FAILED
+            self.g2_ratio[ei] = ratio
+            self.g2_dir[ei]   = dir_dot
+
+    def store_g2(self, samples, metrics):
+        """Keep metrics, the g2_metrics_from_samples results of the G2Samples samples."""
+        for ei, ok, ratio, dir_dot in zip(samples.edges, *metrics):
+            self.g2_state[ei] = _G2_SAMPLED if ok else _G2_FAILED
+            self.g2_ratio[ei] = ratio
+            self.g2_dir[ei]   = dir_dot
+
+    def classes(self, tangent_tol_cos):
+        """EdgeClasses at tangent_tol_cos. The most recent few are kept."""
+        view = self._views.get(tangent_tol_cos)
+        if view is None:
+            with _perf.phase('classify'):
+                edge_class = _threshold_edges(self, tangent_tol_cos)
+            view = EdgeClasses(self, tangent_tol_cos, edge_class)
+            if len(self._views) >= 8:
+                del self._views[next(iter(self._views))]
+            self._views[tangent_tol_cos] = view
+        return view
+
+
+class EdgeClasses:
+    """
+    Edge classes of a FaceGraph at one tangent tolerance.
+    edge_class holds EDGE_* bit flags per edge index. Tangent edges whose G2
+    metrics were not sampled yet are flagged _EDGE_G2_PENDING instead of
+    EDGE_G2; is_g2 and resolve_g2 sample them and settle the flag in place.
+    regions is {mode: RegionLabels}, filled by region_faces.
+    """
+
+    def __init__(self, graph, tangent_tol_cos, edge_class):
+        self.graph      = graph
+        self.tol        = tangent_tol_cos
+        self.edge_class = edge_class
+        self.regions    = None
+
+    def is_g2(self, ei):
+        """True if edge ei is G2 at this tolerance. Samples the edge on first use."""
+        cls = self.edge_class[ei]
+        if cls & _EDGE_G2_PENDING:
+            with _perf.phase('g2'):
+                self.graph.sample_g2((ei,))
+            cls = self._settle_g2(ei)
+        return bool(cls & EDGE_G2)
+
+    def resolve_g2(self):
+        """Sample and settle every pending edge."""
+        with _perf.phase('g2'):
+            _drain(self.resolve_g2_steps())
+
+    def resolve_g2_steps(self, per_step=16):
+        """Generator form of resolve_g2; yields every per_step edges."""
+        pending = [ei for ei, cls in enumerate(self.edge_class) if cls & _EDGE_G2_PENDING]
+        yield from self.graph.sample_g2_steps(pending, per_step)
+        for ei in pending:
+            self._settle_g2(ei)
+
+    def _settle_g2(self, ei):
+        graph = self.graph
+        g2 = (graph.g2_state[ei] == _G2_SAMPLED and graph.g2_ratio[ei] <= G2_CURV_RATIO
+              and graph.g2_dir[ei] >= self.tol)
+        cls = self.edge_class[ei] = EDGE_TANGENT | (EDGE_G2 if g2 else 0)
+        return cls
+
+    def counts(self):
+        """
+        (concave, convex, tangent, g2) edge counts. Pending G2 edges are not
+        sampled: g2 counts only the edges sampled so far.
+        """
+        n = [0, 0, 0, 0]
+        for cls in self.edge_class:
+            if cls & EDGE_CONCAVE: n[0] += 1
+            if cls & EDGE_CONVEX:  n[1] += 1
+            if cls & EDGE_TANGENT: n[2] += 1
+            if cls & EDGE_G2:      n[3] += 1
+        return tuple(n)
+
+
+def _threshold_edges(graph, tangent_tol_cos):
+    """
+    Edge class bytes of graph at tangent_tol_cos, from classify_edges.
+    Raises if the classes do not account for all non-boundary edges.
+    """
+    edge_class = classify_edges(graph.base_class, graph.n_dot, graph.g2_state,
+                                graph.g2_ratio, graph.g2_dir, tangent_tol_cos)
+    n_edges      = len(edge_class)
+    unclassified = edge_class.count(0)
+    accounted    = n_edges - unclassified
+    if unclassified != graph.boundary:
+        raise RuntimeError(f'Edge count mismatch: {accounted}+{graph.boundary} != {n_edges}')
+    return edge_class
+
+
+def classify_edges(base_class, n_dot, g2_state, g2_ratio, g2_dir, tangent_tol_cos):
+    """
+    Numeric stage of edge classification, without API calls: EDGE_* class
+    bytes (bytearray) at tangent_tol_cos from per-edge measurements laid out
+    as in FaceGraph:
+      1. Edges whose |n_dot| >= tol are G1 tangent and lose their base class
+      2. Tangent edges whose G2 metrics pass are also G2
+      3. Tangent edges not sampled yet are _EDGE_G2_PENDING, see EdgeClasses.is_g2
+    Boundary edges are left 0.
+    """
+    if np is not None:
+        n_dot   = np.frombuffer(n_dot, dtype=np.float64)
+        with np.errstate(invalid='ignore'):
+            tangent = np.abs(n_dot) >= tangent_tol_cos  # False for NaN
+        state   = np.frombuffer(g2_state, dtype=np.uint8)
+        g2 = (tangent & (state == _G2_SAMPLED)
+              & (np.frombuffer(g2_ratio, dtype=np.float64) <= G2_CURV_RATIO)
+              & (np.frombuffer(g2_dir, dtype=np.float64) >= tangent_tol_cos))
+        base = np.frombuffer(base_class, dtype=np.uint8)
+        cls  = np.where(tangent, EDGE_TANGENT, base).astype(np.uint8)
+        cls[g2] |= EDGE_G2
+        cls[tangent & (state == _G2_UNKNOWN)] |= _EDGE_G2_PENDING
+        return bytearray(cls.tobytes())
+
+    edge_class = bytearray(base_class)
+    for ei, dot in enumerate(n_dot):
+        if not abs(dot) >= tangent_tol_cos:
+            continue
+        if g2_state[ei] == _G2_UNKNOWN:
+            edge_class[ei] = EDGE_TANGENT | _EDGE_G2_PENDING
+            continue
+        g2 = (g2_state[ei] == _G2_SAMPLED and g2_ratio[ei] <= G2_CURV_RATIO
+              and g2_dir[ei] >= tangent_tol_cos)
+        edge_class[ei] = EDGE_TANGENT | (EDGE_G2 if g2 else 0)
+    return edge_class
+
+
+# ---------- analytic edge continuity ----------
+
+SurfaceParams = collections.namedtuple('SurfaceParams', 'surface_type origin axis radii')
+
+# Closed-form tests: directions within _ANGLE_EPS (sine), lengths within _LENGTH_EPS cm
+_ANGLE_EPS  = 1e-6
+_LENGTH_EPS = 1e-7
+
+
+def surface_params(face):
+    """
+    SurfaceParams(surface_type, origin, axis, radii) of face from one getData
+    call on its plane, cylinder, cone, sphere or torus, as plain tuples:
+      plane     axis = normal, radii ()
+      cylinder  radii (radius,)
+      cone      radii (radius, half angle)
+      sphere    axis None, radii (radius,)
+      torus     radii (major radius, minor radius)
+    origin is None for other surface types (NURBS, elliptical) and when
+    getData fails; such faces are left to evaluator sampling.
+    """
+    ST   = ac.SurfaceTypes
+    geom = face.geometry
+    st   = geom.surfaceType
+    _perf.count()
+    if st == ST.PlaneSurfaceType:
+        ok, o, a, _, _ = ac.Plane.cast(geom).getData()
+        radii = ()
+    elif st == ST.CylinderSurfaceType:
+        ok, o, a, r = ac.Cylinder.cast(geom).getData()
+        radii = (r,)
+    elif st == ST.ConeSurfaceType:
+        ok, o, a, r, half_angle = ac.Cone.cast(geom).getData()
+        radii = (r, half_angle)
+    elif st == ST.SphereSurfaceType:
+        ok, o, r = ac.Sphere.cast(geom).getData()
+        a, radii = None, (r,)
+    elif st == ST.TorusSurfaceType:
+        ok, o, a, major, minor = ac.Torus.cast(geom).getData()
+        radii = (major, minor)
+    else:
+        return SurfaceParams(st, None, None, None)
+    _perf.count()
+    if not ok:
+        return SurfaceParams(st, None, None, None)
+    if a is not None:
+        length = a.length
+        a = (a.x / length, a.y / length, a.z / length)
+    return SurfaceParams(st, (o.x, o.y, o.z), a, radii)
+
+
+def _vdot(a, b):
+    return a[0]*b[0] + a[1]*b[1] + a[2]*b[2]
+
+
+def _vsub(a, b):
+    return (a[0] - b[0], a[1] - b[1], a[2] - b[2])
+
+
+def _vdist(a, b):
+    d = _vsub(a, b)
+    return math.sqrt(_vdot(d, d))
+
+
+def _off_axis(pt, origin, axis):
+    """Distance from the line through origin along axis (unit) to pt."""
+    d = _vsub(pt, origin)
+    t = _vdot(d, axis)
+    return math.sqrt(max(0.0, _vdot(d, d) - t*t))
+
+
+def _cos_or_none(c):
+    """c clamped to 1.0, or None where it is further above 1 than rounding explains."""
+    return min(c, 1.0) if c <= 1.0 + 1e-9 else None
+
+
+def _parallel(a, b):
+    return 1.0 - abs(_vdot(a, b)) <= 0.5 * _ANGLE_EPS * _ANGLE_EPS
+
+
+def _coaxial(s1, s2):
+    return _parallel(s1.axis, s2.axis) and _off_axis(s2.origin, s1.origin, s1.axis) <= _LENGTH_EPS
+
+
+def _same_surface(s1, s2):
+    """True if two SurfaceParams of the same type describe the same surface."""
+    ST = ac.SurfaceTypes
+    st = s1.surface_type
+    if any(abs(a - b) > _LENGTH_EPS for a, b in zip(s1.radii, s2.radii)):
+        return False
+    if st == ST.CylinderSurfaceType:
+        return _coaxial(s1, s2)
+    if st in (ST.PlaneSurfaceType, ST.TorusSurfaceType):
+        # Same normal (axis) and origins level with each other; tori also coaxial
+        return (_parallel(s1.axis, s2.axis)
+                and abs(_vdot(s1.axis, _vsub(s2.origin, s1.origin))) <= _LENGTH_EPS
+                and (st == ST.PlaneSurfaceType or _coaxial(s1, s2)))
+    # Spheres, and cones with the same base circle narrowing the same way: cones
+    # with opposite axes are mirror images meeting at a sharp edge
+    return (max(map(abs, _vsub(s2.origin, s1.origin))) <= _LENGTH_EPS
+            and (s1.axis is None or (_parallel(s1.axis, s2.axis) and _vdot(s1.axis, s2.axis) > 0)))
+
+
+def _law_of_cosines(r1, r2, dist):
+    """|cos| of the angle between the radii of two circles (or spheres) where they meet, or None."""
+    return _cos_or_none(abs(r1*r1 + r2*r2 - dist*dist) / (2.0 * r1 * r2))
+
+
+def analytic_normal_dot(s1, s2):
+    """
+    |dot| of the face normals along an edge between faces with SurfaceParams
+    s1 and s2, where it is the same all along the edge and follows from the
+    surface parameters alone; None where the edge has to be sampled.
+    Handled: plane-plane; planes square to a cylinder, cone or torus axis;
+    plane-sphere; cylinder-cylinder with parallel axes; coaxial cylinder-cone
+    and cylinder-torus; cylinder-sphere centred on the axis; sphere-sphere;
+    and faces on the same surface.
+    The sign is left out: edge classes only use |n_dot|.
+    """
+    if s1.origin is None or s2.origin is None:
+        return None
+    ST    = ac.SurfaceTypes
+    order = (ST.PlaneSurfaceType, ST.CylinderSurfaceType, ST.ConeSurfaceType,
+             ST.SphereSurfaceType, ST.TorusSurfaceType)
+    if order.index(s1.surface_type) > order.index(s2.surface_type):
+        s1, s2 = s2, s1
+    t1, t2 = s1.surface_type, s2.surface_type
+    if t1 == t2 and _same_surface(s1, s2):
+        return 1.0
+
+    if t1 == ST.PlaneSurfaceType:
+        # Distance of the other surface's origin from the plane
+        offset = abs(_vdot(s1.axis, _vsub(s2.origin, s1.origin)))
+        if t2 == ST.PlaneSurfaceType:
+            return min(1.0, abs(_vdot(s1.axis, s2.axis)))
+        if t2 == ST.SphereSurfaceType:
+            return _cos_or_none(offset / s2.radii[0])
+        square = _parallel(s1.axis, s2.axis)
+        if t2 == ST.CylinderSurfaceType:
+            if square:
+                return 0.0  # circular edge, normals at right angles
+            if abs(_vdot(s1.axis, s2.axis)) <= _ANGLE_EPS:
+                return _cos_or_none(offset / s2.radii[0])  # straight edge along the axis
+        elif square and t2 == ST.ConeSurfaceType:
+            return abs(math.sin(s2.radii[1]))
+        elif square and t2 == ST.TorusSurfaceType:
+            return _cos_or_none(offset / s2.radii[1])
+        return None
+
+    if t1 == ST.CylinderSurfaceType:
+        r = s1.radii[0]
+        if t2 == ST.CylinderSurfaceType and _parallel(s1.axis, s2.axis):
+            return _law_of_cosines(r, s2.radii[0], _off_axis(s2.origin, s1.origin, s1.axis))
+        if t2 == ST.SphereSurfaceType and _off_axis(s2.origin, s1.origin, s1.axis) <= _LENGTH_EPS:
+            return _cos_or_none(r / s2.radii[0])
+        if t2 == ST.ConeSurfaceType and _coaxial(s1, s2):
+            return abs(math.cos(s2.radii[1]))
+        if t2 == ST.TorusSurfaceType and _coaxial(s1, s2):
+            return _cos_or_none(abs(r - s2.radii[0]) / s2.radii[1])
+        return None
+
+    if t1 == t2 == ST.SphereSurfaceType:
+        return _law_of_cosines(s1.radii[0], s2.radii[0], _vdist(s1.origin, s2.origin))
+    return None
+
+
+def analytic_g2_metrics(s1, s2):
+    """
+    _g2_metrics (ok, ratio, dir_dot) of an edge between faces with
+    SurfaceParams s1 and s2 where the surface parameters decide it, else None:
+      different analytic types    not G2 (the type rule of _is_g2_edge)
+      two planes, or one surface  G2: equal curvature and directions
+      cylinders (parallel) or spheres touching from opposite sides
+                                  not G2: curvatures of opposite sign
+      cylinders or spheres whose radii differ by more than G2_CURV_RATIO
+                                  not G2; the ratio of the radii stands in
+                                  for the sampled one, which is at least as large
+    Faces of a solid on one surface share its orientation, so their
+    curvatures have the same sign.
+    """
+    if s1.origin is None or s2.origin is None:
+        return None
+    ST = ac.SurfaceTypes
+    st = s1.surface_type
+    if st != s2.surface_type:
+        return False, 0.0, 1.0
+    if st == ST.PlaneSurfaceType or _same_surface(s1, s2):
+        return True, 0.0, 1.0
+    if st in (ST.CylinderSurfaceType, ST.SphereSurfaceType):
+        r1, r2 = s1.radii[0], s2.radii[0]
+        if st == ST.SphereSurfaceType:
+            dist = _vdist(s1.origin, s2.origin)
+        elif _parallel(s1.axis, s2.axis):
+            dist = _off_axis(s2.origin, s1.origin, s1.axis)
+        else:
+            dist = None
+        if dist is not None and abs(dist - (r1 + r2)) <= _LENGTH_EPS:
+            return True, _curv_ratio(1.0 / r1, -1.0 / r2), 1.0
+        ratio = _curv_ratio(r1, r2)
+        if ratio > G2_CURV_RATIO:
+            return True, ratio, 1.0
+    return None
+
+
+def _analytic_edges_steps(surfaces, edge_faces, per_step=256):
+    """
+    Generator: closed-form measurements of every edge between two analytic
+    faces, from the per-face SurfaceParams surfaces, as
+    (n_dot, g2_state, g2_ratio, g2_dir) laid out as in FaceGraph.
+    n_dot is NaN and g2_state _G2_UNKNOWN where the edge has to be sampled.
+    Yields every per_step edges.
+    """
+    n_edges  = len(edge_faces) // 2
+    n_dot    = array('d', [float('nan')]) * n_edges
+    g2_state = bytearray(n_edges)
+    g2_ratio = array('d', [0.0]) * n_edges
+    g2_dir   = array('d', [1.0]) * n_edges
+    for ei in range(n_edges):
+        if ei % per_step == per_step - 1:
+            yield
+        f1, f2 = edge_faces[2*ei], edge_faces[2*ei + 1]
+        if f2 < 0:
             continue
-        n_dot = n1.x*n2.x + n1.y*n2.y + n1.z*n2.z
-        if abs(n_dot) >= tangent_tol_cos:
-            # G1 tangent
-            tangent_tokens.add(tok)
-            concave_tokens.discard(tok)
-            convex_tokens.discard(tok)
-
-
-    boundary  = sum(1 for e in all_edges if len(list(e.faces)) < 2)
-    accounted = len(concave_tokens) + len(convex_tokens) + len(tangent_tokens)
-    if accounted + boundary != total:
-        raise RuntimeError(f'Edge count mismatch: {accounted}+{boundary} != {total}')
-
-    # Build g2_tokens: subset of tangent_tokens where faces are G2-continuous (co-surface)
-    edge_by_tok = {e.entityToken: e for e in all_edges}
-    g2_tokens   = set()
-    for tok in tangent_tokens:
-        edge  = edge_by_tok.get(tok)
-        if edge is None:
+        s1, s2 = surfaces[f1], surfaces[f2]
+        dot = analytic_normal_dot(s1, s2)
+        if dot is not None:
+            n_dot[ei] = dot
+        g2 = analytic_g2_metrics(s1, s2)
+        if g2 is not None:
+            ok, g2_ratio[ei], g2_dir[ei] = g2
+            g2_state[ei] = _G2_SAMPLED if ok else _G2_FAILED
+    return n_dot, g2_state, g2_ratio, g2_dir
+
+
+def _row_dots(a, b):
+    """Dot products of consecutive xyz triples of two flat array('d')."""
+    if np is not None:
+        va = np.frombuffer(a, dtype=np.float64).reshape(-1, 3)
+        vb = np.frombuffer(b, dtype=np.float64).reshape(-1, 3)
+        return array('d', np.einsum('ij,ij->i', va, vb).tobytes())
+    return array('d', [a[j]*b[j] + a[j+1]*b[j+1] + a[j+2]*b[j+2]
+                       for j in range(0, len(a), 3)])
+
+
+def _edge_normal_dots_steps(edges, faces, edge_faces, per_step=256, g1_samples=None,
+                            n_dot=None):
+    """
+    Generator: dot product of the two face normals at the midpoint of every
+    edge, as array('d'); yields every per_step edges or faces.
+    NaN for boundary edges and where a normal could not be evaluated.
+    Midpoints are gathered for all edges first, then each face's normals are
+    fetched with one getNormalsAtPoints call instead of one call per edge side.
+    g1_samples: optional sample count per edge (see _sample_counts). Edges with
+    more than one are sampled again at their other points unless the midpoint
+    is already sharper than SHARP_EDGE_DEG, and keep the dot furthest from
+    tangent.
+    n_dot: optional array('d') of dots already known (see _analytic_edges_steps);
+    it is filled in and returned, and edges whose entry is not NaN are not sampled.
+    """
+    n      = len(edges)
+    if n_dot is None:
+        n_dot = array('d', [float('nan')]) * n
+    pairs  = []  # (face 1, face 2, point)
+    owners = []
+    curves = {}  # edge index -> (evaluator, t0, t1) of edges with more samples
+    for ei, edge in enumerate(edges):
+        if ei % per_step == per_step - 1:
+            yield
+        f1, f2 = edge_faces[2*ei], edge_faces[2*ei + 1]
+        if f2 < 0 or n_dot[ei] == n_dot[ei]:
             continue
-        faces = edge_faces.get(tok, list(edge.faces))
-        if len(faces) < 2:
+        ev = edge.evaluator
+        _, t0, t1 = ev.getParameterExtents()
+        _, pt     = ev.getPointAtParameter((t0 + t1) / 2.0)
+        _perf.count(2)
+        pairs.append((f1, f2, pt))
+        owners.append(ei)
+        if g1_samples is not None and g1_samples[ei] > 1:
+            curves[ei] = (ev, t0, t1)
+    dots = yield from _face_normal_dots_steps(faces, pairs, per_step)
+    for ei, dot in zip(owners, dots):
+        n_dot[ei] = dot
+    if not curves:
+        return n_dot
+
+    sharp_cos = math.cos(math.radians(SHARP_EDGE_DEG))
+    pairs, owners = [], []
+    for n_done, (ei, (ev, t0, t1)) in enumerate(curves.items()):
+        if n_done % per_step == per_step - 1:
+            yield
+        if not abs(n_dot[ei]) >= sharp_cos:
+            continue  # sharp (or unevaluated) at the midpoint: the verdict stands
+        params = [t0 + (t1 - t0) * frac for frac in _sample_fractions(g1_samples[ei])[1:]]
+        ok, pts = ev.getPointsAtParameters(params)
+        _perf.count()
+        if not ok or len(pts) != len(params):
             continue
-        if _is_g2_edge(edge, faces[0], faces[1], tangent_tol_cos):
-            g2_tokens.add(tok)
+        f1, f2 = edge_faces[2*ei], edge_faces[2*ei + 1]
+        pairs.extend((f1, f2, pt) for pt in pts)
+        owners.extend([ei] * len(pts))
+    dots = yield from _face_normal_dots_steps(faces, pairs, per_step)
+    for ei, dot in zip(owners, dots):
+        if abs(dot) < abs(n_dot[ei]):  # False for NaN
+            n_dot[ei] = dot
+    return n_dot
+
+
+def _face_normal_dots_steps(faces, pairs, per_step=256):
+    """
+    Generator: dot products of two faces' normals at a shared point for every
+    (face 1, face 2, point) of pairs, as array('d'), NaN where a normal could
+    not be evaluated. Each face's normals are fetched with one getNormalsAtPoints
+    call instead of one call per point. Yields every per_step faces.
+    """
+    nan     = float('nan')
+    side0   = array('d', [nan]) * (3 * len(pairs))
+    side1   = array('d', [nan]) * (3 * len(pairs))
+    by_face = {}  # face index -> ([points], [(normals array, slot)])
+    for j, (f1, f2, pt) in enumerate(pairs):
+        for fi, normals in ((f1, side0), (f2, side1)):
+            pts, slots = by_face.setdefault(fi, ([], []))
+            pts.append(pt)
+            slots.append((normals, 3 * j))
+
+    for n_done, (fi, (pts, slots)) in enumerate(by_face.items()):
+        if n_done % per_step == per_step - 1:
+            yield
+        ev = faces[fi].evaluator
+        ok, vecs = ev.getNormalsAtPoints(pts)
+        _perf.count()
+        if not ok or len(vecs) != len(pts):
+            # One bad point fails the whole batch; retry the points singly.
+            _perf.count(len(pts))
+            vecs = []
+            for pt in pts:
+                ok1, vec = ev.getNormalAtPoint(pt)
+                vecs.append(vec if ok1 else None)
+        for vec, (normals, j) in zip(vecs, slots):
+            if vec is not None:
+                normals[j], normals[j+1], normals[j+2] = vec.x, vec.y, vec.z
+
+    return _row_dots(side0, side1)
+
+
+def build_face_graph(body, face_table=None, cache=None, precision=PRECISION, analytic=True):
+    """
+    FaceGraph of body: topology, the concave/convex classes reported by the body
+    and the normal dot of every edge. Independent of the tangent tolerance.
+    face_table: {face_token: FaceInfo} for face_info; the body's session cache when omitted.
+    cache: (path, version) of an on-disk edge cache file (see _edge_cache_file);
+    when it matches the body, the per-edge data is read from it instead of the API.
+    precision: one of PRECISIONS, the number of G1 and G2 samples per edge.
+    analytic: decide edges between analytic faces from their surface
+    parameters where possible (see analytic_normal_dot, analytic_g2_metrics)
+    and sample only the rest; False samples every edge.
+    Raises if an edge is reported both concave and convex.
+    """
+    with _perf.phase('graph'):
+        return _drain(build_face_graph_steps(body, face_table=face_table, cache=cache,
+                                             precision=precision, analytic=analytic))
+
+
+def build_face_graph_steps(body, per_step=256, face_table=None, cache=None, precision=PRECISION,
+                           analytic=True):
+    """Generator form of build_face_graph for time slicing; yields every per_step API items."""
+    all_edges   = list(body.edges)
+    edge_tokens = yield from _map_steps(lambda e: e.entityToken, all_edges, per_step)
+    body_faces  = list(body.faces)
+    face_tokens = yield from _map_steps(lambda f: f.entityToken, body_faces, per_step)
+    face_index  = {t: i for i, t in enumerate(face_tokens)}
+    checksum    = _token_checksum(face_tokens, edge_tokens)
+    if face_table is None:
+        face_table = _face_table(body)
+
+    if cache is not None and len(all_edges) >= EDGE_CACHE_MIN_EDGES:
+        stored = read_edge_cache(cache[0], cache[1], len(face_tokens), len(edge_tokens), checksum)
+        if stored is not None:
+            graph = FaceGraph(body_faces, face_tokens, face_index, all_edges, stored['edge_faces'],
+                              stored['base_class'], stored['n_dot'], face_table, checksum,
+                              precision, stored['g2_samples'])
+            graph.g2_state[:] = stored['g2_state']
+            graph.g2_ratio    = stored['g2_ratio']
+            graph.g2_dir      = stored['g2_dir']
+            graph.disk_sampled = len(all_edges) - graph.g2_state.count(_G2_UNKNOWN)
+            return graph
+
+    # Edge tokens are interned to edge indices only while the body's classes are read
+    edge_index  = {tok: ei for ei, tok in enumerate(edge_tokens)}
+    base_class  = bytearray(len(all_edges))
+    for flag, edges in ((EDGE_CONCAVE, body.concaveEdges), (EDGE_CONVEX, body.convexEdges)):
+        for n_done, e in enumerate(edges):
+            if n_done % per_step == per_step - 1:
+                yield
+            base_class[edge_index[e.entityToken]] |= flag
+    del edge_tokens, edge_index
+
+    overlap = base_class.count(EDGE_CONCAVE | EDGE_CONVEX)
+    if overlap:
+        raise RuntimeError(f'{overlap} edges appear in both concave and convex sets')
+
+    # Edge -> faces lookup in the integer face numbering
+    edge_faces = yield from _edge_faces_steps(all_edges, face_index, per_step // 2)
+
+    if analytic:
+        surfaces = yield from _map_steps(surface_params, body_faces, per_step)
+        n_dot, g2_state, g2_ratio, g2_dir = yield from _analytic_edges_steps(
+            surfaces, edge_faces, per_step)
+    else:
+        surfaces = n_dot = None
+    g1_samples, g2_samples = yield from _sample_counts_steps(
+        body_faces, all_edges, edge_faces, precision, per_step, surfaces)
+    n_dot = yield from _edge_normal_dots_steps(all_edges, body_faces, edge_faces, per_step,
+                                               g1_samples, n_dot)
+    graph = FaceGraph(body_faces, face_tokens, face_index, all_edges, edge_faces,
+                      base_class, n_dot, face_table, checksum, precision, g2_samples)
+    if analytic:
+        graph.g2_state[:] = g2_state
+        graph.g2_ratio    = g2_ratio
+        graph.g2_dir      = g2_dir
+    return graph
+
+
+def _sample_counts_steps(faces, edges, edge_faces, precision, per_step=256, surfaces=None):
+    """
+    Generator: (G1, G2) sample counts of every edge at precision as two
+    bytearrays, from _sample_counts. Fetches the surface type of every face
+    unless precision is 'fast' or surfaces, their SurfaceParams, are given,
+    and the length of NURBS edges for 'exact'.
+    """
+    n_edges = len(edges)
+    if precision == 'fast':
+        return bytearray([1]) * n_edges, bytearray([1]) * n_edges
+    nurbs = ac.SurfaceTypes.NurbsSurfaceType
+    if surfaces is not None:
+        face_nurbs = [s.surface_type == nurbs for s in surfaces]
+    else:
+        face_nurbs = yield from _map_steps(lambda f: f.geometry.surfaceType == nurbs,
+                                           faces, per_step)
+    g1 = bytearray(n_edges)
+    g2 = bytearray(n_edges)
+    for ei in range(n_edges):
+        if ei % per_step == per_step - 1:
+            yield
+        f1, f2 = edge_faces[2*ei], edge_faces[2*ei + 1]
+        on_nurbs = f2 >= 0 and (face_nurbs[f1] or face_nurbs[f2])
+        length   = edges[ei].length if on_nurbs and precision == 'exact' else 0.0
+        g1[ei], g2[ei] = _sample_counts(precision, on_nurbs, length)
+    return g1, g2
+
+
+def _edge_faces_steps(edges, face_index, per_step=128):
+    """
+    Flat array('i') of the two face indices of every edge (-1 where an edge has
+    fewer faces), for FaceGraph.edge_faces. Yields every per_step edges.
+    """
+    edge_faces = array('i', [-1]) * (2 * len(edges))
+    for ei, edge in enumerate(edges):
+        if ei % per_step == per_step - 1:
+            yield
+        for side, f in zip((0, 1), edge.faces):
+            edge_faces[2*ei + side] = face_index[f.entityToken]
+    return edge_faces
+
 
-    return concave_tokens, convex_tokens, tangent_tokens, g2_tokens
+# ---------- on-disk edge cache ----------
 
+# Header: magic, format, face count, edge count, version digest, token checksum; 64 bytes.
+# Then per edge: n_dot, g2_ratio, g2_dir (float64), edge_faces (2 x int32),
+# base_class, g2_state, g2_samples (uint8), all little-endian, so every array is aligned.
+_EDGE_CACHE_HEADER = struct.Struct('<4sIII20s20s8x')
+_EDGE_CACHE_MAGIC  = b'FFEC'
+_EDGE_CACHE_FORMAT = 2
 
-def get_adj_face(edge, ref_face):
-    adj = [f for f in edge.faces if f != ref_face]
-    return adj[0] if adj else None
+
+def _token_checksum(face_tokens, edge_tokens):
+    """SHA-1 digest of a body's face and edge tokens, in order."""
+    h = hashlib.sha1()
+    for tokens in (face_tokens, edge_tokens):
+        h.update('\n'.join(tokens).encode())
+        h.update(b'\0')
+    return h.digest()
+
+
+def _document_version(doc):
+    """Saved version number of doc, or None for unsaved documents."""
+    try:
+        return doc.dataFile.versionNumber
+    except:
+        return None
+
+
+def _edge_cache_file(body_tok, entry, precision):
+    """
+    (path, version digest) of the on-disk edge cache of a _body_cache entry at
+    precision, or None when the cache is disabled. The file is named after the
+    document, body and precision; the version covers the document version and
+    design signature.
+    """
+    if not EDGE_CACHE_DIR or sys.byteorder != 'little':
+        return None
+    name    = hashlib.sha1(f'{entry["doc"]}|{body_tok}|{precision}'.encode()).hexdigest()
+    version = hashlib.sha1(repr((_document_version(_app.activeDocument),
+                                 entry['signature'])).encode()).digest()
+    return os.path.join(EDGE_CACHE_DIR, name + '.ffec'), version
+
+
+def read_edge_cache(path, version, n_faces, n_edges, checksum):
+    """
+    Per-edge arrays of a file written by write_edge_cache, as {name: array}, or
+    None if the file is missing, of another version or another topology.
+    The header is checked first; the arrays are copied out of a memory map.
+    """
+    try:
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            magic, fmt, n_f, n_e, ver, chk = _EDGE_CACHE_HEADER.unpack_from(mm)
+            size = _EDGE_CACHE_HEADER.size + 35 * n_e
+            if ((magic, fmt, n_f, n_e, ver, chk) !=
+                    (_EDGE_CACHE_MAGIC, _EDGE_CACHE_FORMAT, n_faces, n_edges, version, checksum)
+                    or len(mm) != size):
+                return None
+            out = {}
+            pos = _EDGE_CACHE_HEADER.size
+            for name, typecode, count in (('n_dot', 'd', n_e), ('g2_ratio', 'd', n_e),
+                                          ('g2_dir', 'd', n_e), ('edge_faces', 'i', 2 * n_e)):
+                arr = array(typecode)
+                end = pos + arr.itemsize * count
+                arr.frombytes(mm[pos:end])
+                out[name] = arr
+                pos = end
+            out['base_class'] = bytearray(mm[pos:pos + n_e])
+            out['g2_state']   = bytearray(mm[pos + n_e:pos + 2 * n_e])
+            out['g2_samples'] = bytearray(mm[pos + 2 * n_e:pos + 3 * n_e])
+        os.utime(path)  # recently used, see _prune_edge_cache
+        return out
+    except (OSError, ValueError, struct.error):
+        return None
+
+
+def write_edge_cache(path, version, graph):
+    """Write the per-edge arrays of graph to path, for read_edge_cache. Replaces the file atomically."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(_EDGE_CACHE_HEADER.pack(_EDGE_CACHE_MAGIC, _EDGE_CACHE_FORMAT, len(graph.faces),
+                                        len(graph.edges), version, graph.token_checksum))
+        for arr in (graph.n_dot, graph.g2_ratio, graph.g2_dir, graph.edge_faces):
+            arr.tofile(f)
+        f.write(graph.base_class)
+        f.write(graph.g2_state)
+        f.write(graph.g2_samples)
+    os.replace(tmp, path)
+
+
+def _prune_edge_cache():
+    """Remove the least recently used cache files beyond EDGE_CACHE_MAX_FILES."""
+    files = [os.path.join(EDGE_CACHE_DIR, n) for n in os.listdir(EDGE_CACHE_DIR)
+             if n.endswith('.ffec')]
+    files.sort(key=os.path.getmtime)
+    for path in files[:-EDGE_CACHE_MAX_FILES]:
+        os.remove(path)
+
+
+def _save_edge_cache(body_tok, entry):
+    """
+    Write the FaceGraph of a _body_cache entry to the on-disk edge cache if it
+    is large enough and has sampled G2 edges since it was last read or written.
+    """
+    graph = _entry_graph(body_tok, entry)
+    if graph is None or graph.token_checksum is None:
+        return
+    cache = _edge_cache_file(body_tok, entry, graph.precision)
+    if cache is None:
+        return
+    n_sampled = len(graph.edges) - graph.g2_state.count(_G2_UNKNOWN)
+    if len(graph.edges) < EDGE_CACHE_MIN_EDGES or n_sampled == graph.disk_sampled:
+        return
+    with _perf.phase('disk'):
+        try:
+            write_edge_cache(cache[0], cache[1], graph)
+            _prune_edge_cache()
+        except OSError as e:
+            _dbg(f'Edge cache not written: {e}')
+            return
+    graph.disk_sampled = entry['graph']['disk_sampled'] = n_sampled
+
+
+def _map_steps(fn, items, per_step):
+    """[fn(item) for item in items], yielding every per_step items."""
+    out = []
+    for i, item in enumerate(items):
+        if i % per_step == per_step - 1:
+            yield
+        out.append(fn(item))
+    return out
 
 
 def is_extrusion_cylinder(adj_face, edge):
@@ -287,16 +1766,81 @@ def is_extrusion_cylinder(adj_face, edge):
         ev   = edge.evaluator
         _, t0, t1 = ev.getParameterExtents()
         _, tan    = ev.getTangent((t0 + t1) / 2.0)
+        _perf.count(2)
         dot   = abs(tan.x*axis.x + tan.y*axis.y + tan.z*axis.z)
         dot   = max(-1.0, min(1.0, dot))
         return math.degrees(math.acos(dot)) > 80.0
     return False
 
-def flood_fill(seed_face, mode, tangent_tol_cos, lineage=None):
+def _graph_for(body, body_tok=None):
+    """Cached FaceGraph of body, built on first use."""
+    # Per-body cache persists across runs until the design changes; tolerances are views of it
+    if body_tok is None:
+        body_tok = body.entityToken
+    entry = _body_cache(body, body_tok)
+    graph = _current_graph(body_tok, entry)
+    if graph is None:
+        precision = _shared.get('precision', PRECISION)
+        graph = build_face_graph(
+            body, cache=_edge_cache_file(body_tok, entry, precision), precision=precision)
+        _keep_graph(body_tok, entry, graph)
+    return graph
+
+
+def _entry_graph(body_tok, entry):
     """
-    BFS flood fill across BRep faces using pre-classified edge sets.
-    lineage: optional dict {face_token: (parent_token, rule, depth)} for debug tree output.
-    Concave mode rules (applied from every queued face):
+    FaceGraph of a _body_cache entry, or None. The entry holds the graph's
+    state only; the object is made from it once per module load.
+    """
+    state = entry['graph']
+    if state is None:
+        return None
+    held = _graphs.get(body_tok)
+    if held is None or held[0] is not state:
+        held = _graphs[body_tok] = (state, FaceGraph.from_state(state))
+    return held[1]
+
+
+def _keep_graph(body_tok, entry, graph):
+    """Store the FaceGraph graph of body_tok in its _body_cache entry."""
+    state = entry['graph'] = graph.state()
+    _graphs[body_tok] = (state, graph)
+
+
+def _current_graph(body_tok, entry):
+    """
+    FaceGraph of a _body_cache entry if it was built at the command's sampling
+    precision, else None. A graph of another precision is dropped with the
+    body's cached regions.
+    """
+    graph = _entry_graph(body_tok, entry)
+    if graph is not None and graph.precision != _shared.get('precision', PRECISION):
+        graph = entry['graph'] = None
+        _forget_body(body_tok)
+    return graph
+
+
+def _classes_for(body, tangent_tol_cos):
+    """EdgeClasses of body at tangent_tol_cos, building the body's FaceGraph on first use."""
+    body_tok = body.entityToken
+    graph    = _graph_for(body, body_tok)
+    fresh    = tangent_tol_cos not in graph._views
+    classes  = graph.classes(tangent_tol_cos)
+    if fresh and _shared.get('debug'):
+        n_concave, n_convex, n_tangent, n_g2 = classes.counts()
+        n_pending = sum(1 for cls in classes.edge_class if cls & _EDGE_G2_PENDING)
+        _dbg(f"Edge sets [{body_tok[:8]}]: {n_concave} concave, "
+             f"{n_convex} convex, {n_tangent} tangent, "
+             f"{n_g2} g2 ({n_pending} not sampled yet) = {len(graph.edges)} total")
+    return classes
+
+
+def crossing_rule(classes, mode, fi, ai, ei):
+    """
+    Name of the rule that lets a flood fill in mode cross edge ei from face fi
+    into face ai (all FaceGraph indices), or '' if none applies.
+    classes: EdgeClasses of the body at the fill's tolerance.
+    Concave mode rules:
       1. G2 co-surface edge
       2. Tangent edge + adjacent face is concave curved
       3. Concave sharp edge
@@ -304,92 +1848,332 @@ def flood_fill(seed_face, mode, tangent_tol_cos, lineage=None):
     Convex mode: mirror of Concave.
     Tangent mode: cross any tangent edge.
     """
-    body      = seed_face.body
-    body_tok  = body.entityToken
-    cache_key = (body_tok, tangent_tol_cos)
-    # Per-body cache persists for entire script run; keyed by (body_token, tol)
-    edge_cache = _shared.setdefault('_edge_cache', {})
-    if cache_key not in edge_cache:
-        concave_tokens, convex_tokens, tangent_tokens, g2_tokens = build_edge_sets(body, tangent_tol_cos)
-        edge_cache[cache_key] = (concave_tokens, convex_tokens, tangent_tokens, g2_tokens)
-        _dbg(f"Edge sets [{body_tok[:8]}]: {len(concave_tokens)} concave, "
-             f"{len(convex_tokens)} convex, {len(tangent_tokens)} tangent, "
-             f"{len(g2_tokens)} g2 = {body.edges.count} total")
-    concave_tokens, convex_tokens, tangent_tokens, g2_tokens = edge_cache[cache_key]
-
-    visited_tokens = {seed_face.entityToken}
-    visited_faces  = [seed_face]
-    queue          = [(seed_face, 0)]  # (face, depth)
+    graph = classes.graph
+    cls   = classes.edge_class[ei]
+    is_tangent = cls & EDGE_TANGENT
+
+    if mode == 'tangent':
+        return 'R1-edge-tangent' if is_tangent else ''
+
+    if cls & EDGE_G2 or (cls & _EDGE_G2_PENDING and classes.is_g2(ei)):
+        return 'R1-G2-cosurface'
+
+    adj_concavity = graph.concavity(ai)
+
+    if mode == 'concave':
+        if is_tangent and adj_concavity == True:
+            return 'R2-edge-tangent-adj-face-concave'
+        if cls & EDGE_CONCAVE:
+            return 'R3-edge-concave'
+        if is_tangent and graph.concavity(fi) == True:
+            if adj_concavity is None:
+                return 'R4-from-concave-face'
+            if adj_concavity == False and graph.is_extrusion(ai, ei):
+                return 'R4-from-concave-face'
+
+    elif mode == 'convex':
+        if is_tangent and adj_concavity == False:
+            return 'R2-edge-tangent-adj-face-convex'
+        if cls & EDGE_CONVEX:
+            return 'R3-edge-convex'
+        if is_tangent and graph.concavity(fi) == False:
+            if adj_concavity is None:
+                return 'R4-from-convex-face'
+            if adj_concavity == True and graph.is_extrusion(ai, ei):
+                return 'R4-from-convex-face'
+
+    return ''
+
+
+class FloodFill:
+    """
+    Resumable BFS flood fill from one seed face index over an EdgeClasses view.
+    Edges are crossed per crossing_rule, applied from every queued face.
+    run() advances the fill, optionally within a face and/or time budget, so a
+    large region can be previewed partially and completed later.
+    sym[i] is set for faces reached from the seed only across crossings that
+    are allowed in both directions: a fill seeded at such a face floods the
+    same region, so its result can be reused.
+    """
+
+    def __init__(self, classes, seed, mode, track_lineage=False):
+        self.classes = classes
+        self.seed    = seed
+        self.mode    = mode
+        self.visited = bytearray(len(classes.graph.faces))
+        self.visited[seed] = 1
+        self.sym     = bytearray(len(classes.graph.faces))
+        self.sym[seed] = 1
+        self.order   = [seed]
+        self.queue   = collections.deque([(seed, 0)])  # (face index, depth)
+        self.parents = {seed: (None, 'seed', 0)} if track_lineage else None
+
+    @property
+    def done(self):
+        return not self.queue
+
+    def run(self, max_faces=None, max_seconds=None):
+        """
+        Advance the fill until it completes, max_faces more faces have been
+        added, or max_seconds have elapsed. Returns True when complete.
+        """
+        with _perf.phase('bfs'):
+            return self._advance(max_faces, max_seconds)
+
+    def _advance(self, max_faces, max_seconds):
+        classes  = self.classes
+        graph    = classes.graph
+        mode     = self.mode
+        offsets  = graph.offsets
+        adj_face = graph.adj_face
+        adj_edge = graph.adj_edge
+        visited  = self.visited
+        sym      = self.sym
+        order    = self.order
+        queue    = self.queue
+        parents  = self.parents
+        stop_len = len(order) + max_faces if max_faces is not None else None
+        deadline = time.perf_counter() + max_seconds if max_seconds is not None else None
+
+        while queue:
+            if stop_len is not None and len(order) >= stop_len:
+                break
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+            fi, depth = queue.popleft()  # FIFO for tree order
+
+            for k in range(offsets[fi], offsets[fi + 1]):
+                ai = adj_face[k]
+                if visited[ai]:
+                    continue
+                ei   = adj_edge[k]
+                rule = crossing_rule(classes, mode, fi, ai, ei)
+                if rule:
+                    visited[ai] = 1
+                    if sym[fi] and (mode == 'tangent' or crossing_rule(classes, mode, ai, fi, ei)):
+                        sym[ai] = 1
+                    order.append(ai)
+                    queue.append((ai, depth + 1))
+                    if parents is not None:
+                        parents[ai] = (fi, rule, depth + 1)
+
+        return not queue
+
+    def faces(self):
+        """BRepFaces found so far, seed first."""
+        faces = self.classes.graph.faces
+        return [faces[i] for i in self.order]
+
+    def lineage(self, lineage):
+        """Fill lineage {face_token: (parent_token, rule, depth)} with the faces found so far."""
+        tokens = self.classes.graph.face_tokens
+        for fi, (pi, rule, depth) in self.parents.items():
+            lineage[tokens[fi]] = (tokens[pi] if pi is not None else None, rule, depth)
+        return lineage
+
+
+def start_flood_fill(seed_face, mode, tangent_tol_cos, track_lineage=False):
+    """FloodFill job for seed_face; nothing is filled until its run() is called."""
+    classes = _classes_for(seed_face.body, tangent_tol_cos)
+    seed    = classes.graph.face_index[seed_face.entityToken]
+    return FloodFill(classes, seed, mode, track_lineage)
+
+
+def flood_fill(seed_face, mode, tangent_tol_cos, lineage=None,
+               max_faces=None, max_seconds=None):
+    """
+    BFS flood fill across BRep faces using pre-classified edge sets.
+    Runs on the body's FaceGraph; the API is only used to map the result back to faces
+    (and, once per face, for concavity).
+    lineage: optional dict {face_token: (parent_token, rule, depth)} for debug tree output.
+    max_faces, max_seconds: optional budgets. When one runs out the partial region
+    is returned; use start_flood_fill to be able to resume it.
+    Without lineage and budgets the region is read from or stored in the region cache.
+    """
+    if lineage is None and max_faces is None and max_seconds is None:
+        body     = seed_face.body
+        body_tok = body.entityToken
+        classes  = _classes_for(body, tangent_tol_cos)
+        faces    = classes.graph.faces
+        seed     = classes.graph.face_index[seed_face.entityToken]
+        order    = _cached_region(body_tok, classes, seed, mode)
+        if order is None:
+            job = FloodFill(classes, seed, mode)
+            job.run()
+            order = _cache_region(body_tok, job)
+        return [faces[i] for i in order]
+    job = start_flood_fill(seed_face, mode, tangent_tol_cos, lineage is not None)
+    job.run(max_faces, max_seconds)
     if lineage is not None:
-        lineage[seed_face.entityToken] = (None, 'seed', 0)
+        job.lineage(lineage)
+    return job.faces()
+
+
+def _cached_region(body_tok, classes, seed, mode):
+    """Face indices of the cached region of face index seed at classes' tolerance, or None."""
+    return _regions.get((body_tok, seed, mode, classes.tol))
+
+
+def _cache_region(body_tok, job):
+    """Store the region of the completed FloodFill job in the region cache; returns its face indices."""
+    order = array('i', job.order)
+    _regions.put((body_tok, job.seed, job.mode, job.classes.tol), order)
+    return order
+
+
+class RegionLabels:
+    """
+    Flood-fill regions of every face of one FaceGraph for one mode.
+    label[i] is the id of the set of faces mutually reachable with face i;
+    every seed with the same label floods to the same region.
+    successors[label] holds the labels reachable across one-way crossings.
+    """
+
+    def __init__(self, label, members, successors):
+        self.label      = label
+        self.members    = members
+        self.successors = successors
+        self._regions   = {}
+
+    def region(self, fi):
+        """Face indices flooded from face fi, starting with fi."""
+        lbl = self.label[fi]
+        reg = self._regions.get(lbl)
+        if reg is None:
+            seen  = {lbl}
+            stack = [lbl]
+            reg   = []
+            while stack:
+                cur = stack.pop()
+                reg.extend(self.members[cur])
+                for nxt in self.successors.get(cur, ()):
+                    if nxt not in seen:
+                        seen.add(nxt)
+                        stack.append(nxt)
+            self._regions[lbl] = reg
+        return [fi] + [i for i in reg if i != fi]
+
+
+def label_regions(classes):
+    """
+    Label the faces of classes.graph for all three modes in one pass over the edges.
+    Edges that crossing_rule allows in both directions are merged with union-find;
+    direction-dependent crossings (R4, and R2 into a face that cannot return)
+    are kept as one-way links between labels and resolved when a region is read.
+    Returns {mode: RegionLabels}.
+    """
+    with _perf.phase('labels'):
+        classes.resolve_g2()  # every tangent edge is tested: sample them in bulk first
+        return _drain(label_regions_steps(classes))
 
-    while queue:
-        face, depth = queue.pop(0)  # FIFO for tree order
 
-        for edge in face.edges:
-            tok      = edge.entityToken
-            adj_face = get_adj_face(edge, face)
-            if adj_face is None or adj_face.entityToken in visited_tokens:
+def label_regions_steps(classes, faces_per_step=64):
+    """
+    Generator form of label_regions for time slicing: yields after every
+    faces_per_step faces and returns the labels (StopIteration.value).
+    """
+    graph    = classes.graph
+    modes    = ('concave', 'convex', 'tangent')
+    n_faces  = len(graph.faces)
+    parent   = {m: array('i', range(n_faces)) for m in modes}
+    one_way  = {m: [] for m in modes}
+
+    def find(par, i):
+        while par[i] != i:
+            par[i] = par[par[i]]
+            i = par[i]
+        return i
+
+    seen_edges = bytearray(len(graph.edges))
+    for fi in range(n_faces):
+        if fi % faces_per_step == faces_per_step - 1:
+            yield
+        for k in range(graph.offsets[fi], graph.offsets[fi + 1]):
+            ei = graph.adj_edge[k]
+            if seen_edges[ei]:
                 continue
+            seen_edges[ei] = 1
+            ai = graph.adj_face[k]
+            for m in modes:
+                fwd = bool(crossing_rule(classes, m, fi, ai, ei))
+                rev = bool(crossing_rule(classes, m, ai, fi, ei))
+                if fwd and rev:
+                    par = parent[m]
+                    ra, rb = find(par, fi), find(par, ai)
+                    if ra != rb:
+                        par[max(ra, rb)] = min(ra, rb)
+                elif fwd:
+                    one_way[m].append((fi, ai))
+                elif rev:
+                    one_way[m].append((ai, fi))
+
+    labels = {}
+    for m in modes:
+        par     = parent[m]
+        label   = array('i', [0]) * n_faces
+        ids     = {}
+        members = []
+        for i in range(n_faces):
+            root = find(par, i)
+            lbl  = ids.get(root)
+            if lbl is None:
+                lbl = ids[root] = len(members)
+                members.append([])
+            label[i] = lbl
+            members[lbl].append(i)
+        successors = {}
+        for a, b in one_way[m]:
+            la, lb = label[a], label[b]
+            if la != lb:
+                successors.setdefault(la, set()).add(lb)
+        labels[m] = RegionLabels(label, members, successors)
+    return labels
+
+
+def _drain(steps):
+    """Run a step generator to completion and return its return value."""
+    while True:
+        try:
+            next(steps)
+        except StopIteration as stop:
+            return stop.value
 
-            is_tangent       = tok in tangent_tokens
-            is_sharp_concave = tok in concave_tokens
-            is_sharp_convex  = tok in convex_tokens
-            adj_curved       = is_curved_face(adj_face)
-            adj_concavity    = is_face_concave(adj_face) if adj_curved else None
-
-            match = False
-
-            face_concavity = is_face_concave(face) if is_curved_face(face) else None
-            is_g2          = tok in g2_tokens
-            rule           = ''
-
-            if mode == 'tangent':
-                rule = 'R1-edge-tangent'
-                match = is_tangent
-
-            elif mode == 'concave':
-                if is_g2:
-                    rule = 'R1-G2-cosurface'
-                    match = True
-                elif is_tangent and adj_concavity == True:
-                    rule = 'R2-edge-tangent-adj-face-concave'
-                    match = True
-                elif is_sharp_concave:
-                    rule = 'R3-edge-concave'
-                    match = True
-                elif is_tangent and face_concavity == True:
-                    rule = 'R4-from-concave-face'
-                    if adj_concavity is None:
-                        match = True
-                    elif adj_concavity == False:
-                        match = is_extrusion_cylinder(adj_face, edge)
-
-            elif mode == 'convex':
-                if is_g2:
-                    rule = 'R1-G2-cosurface'
-                    match = True
-                elif is_tangent and adj_concavity == False:
-                    rule = 'R2-edge-tangent-adj-face-convex'
-                    match = True
-                elif is_sharp_convex:
-                    rule = 'R3-edge-convex'
-                    match = True
-                elif is_tangent and face_concavity == False:
-                    rule = 'R4-from-convex-face'
-                    if adj_concavity is None:
-                        match = True
-                    elif adj_concavity == True:
-                        match = is_extrusion_cylinder(adj_face, edge)
-
-            if match:
-                visited_tokens.add(adj_face.entityToken)
-                visited_faces.append(adj_face)
-                queue.append((adj_face, depth + 1))
-                if lineage is not None:
-                    lineage[adj_face.entityToken] = (face.entityToken, rule, depth + 1)
-
-    return visited_faces
+
+def region_faces(seed_face, mode, tangent_tol_cos):
+    """
+    Same faces as flood_fill(seed_face, mode, tangent_tol_cos), read from the
+    body's precomputed region labels instead of running a BFS.
+    The labels are built on the first call for a body and tolerance.
+    """
+    classes = _classes_for(seed_face.body, tangent_tol_cos)
+    graph   = classes.graph
+    if classes.regions is None:
+        classes.regions = label_regions(classes)
+    with _perf.phase('lookup'):
+        seed = graph.face_index[seed_face.entityToken]
+        return [graph.faces[i] for i in classes.regions[mode].region(seed)]
+
+
+def flood_fill_batch(body, seeds, mode, tangent_tol_cos, graph=None, precision=PRECISION):
+    """
+    Flood fill every face in seeds (faces of body) in one pass.
+    Returns a list of face lists aligned with seeds, each the same faces as
+    flood_fill(seed, mode, tangent_tol_cos) and starting with its seed.
+    The body's regions are labelled once, so seeds that fall in the same
+    region share the work. Does not use the command's state, UI or caches;
+    pass graph (a FaceGraph of body from an earlier call or build_face_graph)
+    to reuse the extracted topology across modes and tolerances, or the
+    sampling precision of the graph to build.
+    """
+    if graph is None:
+        graph = build_face_graph(body, face_table={}, precision=precision)
+    classes = graph.classes(tangent_tol_cos)
+    if classes.regions is None:
+        classes.regions = label_regions(classes)
+    labels = classes.regions[mode]
+    index  = graph.face_index
+    faces  = graph.faces
+    return [[faces[i] for i in labels.region(index[seed.entityToken])] for seed in seeds]
 
 
 # ---------- helpers ----------
@@ -405,43 +2189,376 @@ _SURF_NAMES = {
     ac.SurfaceTypes.EllipticalConeSurfaceType: 'EllCone',
 }
 
-def _face_desc(face):
-    """Short description of a face for debug logging."""
-    st      = face.geometry.surfaceType
-    name    = _SURF_NAMES.get(st, str(st))
-    curved  = is_curved_face(face)
-    conc    = is_face_concave(face) if curved else None
+def _face_desc(face, graph=None):
+    """Short description of a face for debug logging. graph: FaceGraph of face.body."""
+    if graph is None:
+        graph = _graph_for(face.body)
+    info    = face_info(face, graph._face_table)
+    name    = _SURF_NAMES.get(info.surface_type, str(info.surface_type))
+    conc    = info.concavity
     conc_s  = 'concave' if conc == True else 'convex' if conc == False else 'flat'
-    faces   = list(face.body.faces)
-    try:
-        idx = next(i for i,f in enumerate(faces) if f.entityToken == face.entityToken)
-    except StopIteration:
-        idx = -1
+    if info.confidence < 1.0:
+        conc_s += f' {info.confidence:.2f}'
+    idx     = graph.face_index.get(face.entityToken, -1)
     return f'{name}[{idx}]({conc_s})'
 
 
-def _build_face_index_graphics(body):
-    """Draw face index numbers at pointOnFace for each face in body.
-    Called once per body per run when debug is enabled.
+def _short_desc(face, graph):
+    info = face_info(face, graph._face_table)
+    st   = _SURF_NAMES.get(info.surface_type, str(info.surface_type))
+    conc = info.concavity
+    cs   = 'concave' if conc == True else 'convex' if conc == False else 'flat'
+    return f'{st}({cs})'
+
+
+def render_lineage(seed, faces, lineage, graph, mode):
+    """
+    Debug text of a flood fill: header line and the lineage tree, one face per line.
+    Children follow their parent depth-first in fill order. Built with an explicit
+    stack so deep tangent chains cannot hit the recursion limit.
+    lineage: {face_token: (parent_token, rule, depth)} from flood_fill.
+    """
+    face_index = graph.face_index
+    children   = collections.defaultdict(list)
+    for f in faces:
+        parent_tok, rule, _ = lineage.get(f.entityToken, (None, '?', 0))
+        children[parent_tok].append((f, rule))
+
+    lines = ['---',
+             f'Mode: {mode}  Seed: {_face_desc(seed, graph)}  Found: {len(faces)} faces',
+             f'[{face_index.get(seed.entityToken, -1)}] {_short_desc(seed, graph)} [seed]']
+    # (face, parent index, rule, depth); children pushed reversed to pop in fill order
+    stack = [(child, face_index.get(seed.entityToken, -1), rule, 1)
+             for child, rule in reversed(children.get(seed.entityToken, []))]
+    while stack:
+        f, pidx, rule, depth = stack.pop()
+        idx = face_index.get(f.entityToken, -1)
+        lines.append(f'{"        " * depth}[{pidx}]->[{idx}] {_short_desc(f, graph)} [{rule}]')
+        stack.extend((child, idx, child_rule, depth + 1)
+                     for child, child_rule in reversed(children.get(f.entityToken, [])))
+    return '\n'.join(lines)
+
+
+def lineage_records(faces, lineage, graph):
+    """
+    One dict per face of a flood fill, in fill order:
+    face and parent FaceGraph indices (parent None for the seed), rule, depth,
+    surface type name, concavity and its confidence.
+    """
+    face_index = graph.face_index
+    records    = []
+    for f in faces:
+        tok = f.entityToken
+        parent_tok, rule, depth = lineage.get(tok, (None, '?', 0))
+        info = face_info(f, graph._face_table)
+        records.append({
+            'face':      face_index.get(tok, -1),
+            'parent':    face_index.get(parent_tok, -1) if parent_tok is not None else None,
+            'rule':      rule,
+            'depth':     depth,
+            'surface':   _SURF_NAMES.get(info.surface_type, str(info.surface_type)),
+            'concavity': info.concavity,
+            'confidence': info.confidence,
+        })
+    return records
+
+
+def write_lineage(path, records, mode):
+    """
+    Write lineage_records to path: one JSON object per line for .jsonl,
+    else a single JSON document {'mode', 'faces'}.
+    """
+    with open(path, 'w') as f:
+        if path.lower().endswith('.jsonl'):
+            for rec in records:
+                f.write(json.dumps(dict(rec, mode=mode)) + '\n')
+        else:
+            json.dump({'mode': mode, 'faces': records}, f, indent=1)
+
+
+def _show_face_indices(body, face_indices):
+    """
+    Show face index numbers (FaceGraph numbering, as in the debug log) at
+    pointOnFace of the first DEBUG_MAX_LABELS of face_indices, hiding the
+    other labels of body. Each body has one graphics group, kept while the
+    command runs; a label is created the first time its face is shown and
+    then only toggled, so the cost follows the region, not the body.
     """
+    gfx      = _shared.setdefault('gfx', {})
+    body_tok = body.entityToken
+    entry    = gfx.get(body_tok)
+    if entry is None or not entry['group'].isValid:
+        design = af.Design.cast(_app.activeProduct)
+        grp    = design.rootComponent.customGraphicsGroups.add()
+        grp.id = GFX_ID_PREFIX + body_tok
+        bb     = af.CustomGraphicsBillBoard.create(ac.Point3D.create(0,0,0))
+        bb.billBoardStyle = af.CustomGraphicsBillBoardStyles.ScreenBillBoardStyle
+        entry  = gfx[body_tok] = {'group': grp, 'billboard': bb, 'labels': {}, 'shown': set()}
+    graph  = _graph_for(body, body_tok)
+    labels = entry['labels']
+    want   = set(face_indices[:DEBUG_MAX_LABELS])
+    for idx in entry['shown'] - want:
+        labels[idx].isVisible = False
+    for idx in want - entry['shown']:
+        txt = labels.get(idx)
+        if txt is None:
+            pt = face_info(graph.faces[idx], graph._face_table).point
+            m  = ac.Matrix3D.create()
+            m.translation = ac.Vector3D.create(pt.x, pt.y, pt.z)
+            txt = labels[idx] = entry['group'].addText(f'.{idx}', 'Arial', 0.3, m)
+            txt.billBoarding = entry['billboard']
+        else:
+            txt.isVisible = True
+    entry['shown'] = want
+    _app.activeViewport.refresh()
+
+
+def _clear_face_indices():
+    """Delete the face index graphics groups of this script, leaving other groups alone."""
+    _shared.pop('gfx', None)
     design = af.Design.cast(_app.activeProduct)
-    root   = design.rootComponent
-    # Clear any existing debug graphics group for this body
-    grp_name = f'face_idx_{body.entityToken[:8]}'
-    grps = root.customGraphicsGroups
+    if not design:
+        return
+    grps = design.rootComponent.customGraphicsGroups
     for gi in range(grps.count - 1, -1, -1):
-        grps.item(gi).deleteMe()
-    grp = grps.add()
-    bb = af.CustomGraphicsBillBoard.create(ac.Point3D.create(0,0,0))
-    bb.billBoardStyle = af.CustomGraphicsBillBoardStyles.ScreenBillBoardStyle
-    for idx, face in enumerate(body.faces):
-        pt = face.pointOnFace
-        m  = ac.Matrix3D.create()
-        m.translation = ac.Vector3D.create(pt.x, pt.y, pt.z)
-        txt = grp.addText(f'.{idx}', 'Arial', 0.3, m)
-        txt.billBoarding = bb
+        grp = grps.item(gi)
+        if grp.id.startswith(GFX_ID_PREFIX):
+            grp.deleteMe()
     _app.activeViewport.refresh()
-    return grp
+
+
+def _set_preview(classes, mode, faces, job=None, label=None, fi=None):
+    """
+    Remember the region last previewed, for reuse by the next hovers: from
+    job (possibly still running), read from region label label, or the
+    cached region of face index fi.
+    """
+    prev = _shared['preview'] = {'classes': classes, 'mode': mode, 'job': job, 'label': label,
+                                 'fi': fi, 'faces': faces, 'seed': None, 'col': None}
+    return prev
+
+
+def _reusable_preview(classes, mode, fi):
+    """The last preview if a fill from face fi is guaranteed to give the same region, else None."""
+    prev = _shared.get('preview')
+    if not prev or prev['classes'] is not classes or prev['mode'] != mode:
+        return None
+    if prev['label'] is not None:
+        same = classes.regions[mode].label[fi] == prev['label']
+    elif prev['job'] is not None:
+        job  = prev['job']
+        same = job is _shared.get('job') and job.sym[fi]
+    else:
+        same = prev['fi'] == fi
+    return prev if same else None
+
+
+def _stored_preview(body_tok, classes, mode, fi):
+    """Preview of face index fi from the region labels or the region cache, or None if neither has it."""
+    with _perf.phase('lookup'):
+        faces = classes.graph.faces
+        if classes.regions is not None:
+            labels = classes.regions[mode]
+            return _set_preview(classes, mode, [faces[i] for i in labels.region(fi)],
+                                label=labels.label[fi])
+        order = _cached_region(body_tok, classes, fi, mode)
+        if order is None:
+            return None
+        return _set_preview(classes, mode, [faces[i] for i in order], fi=fi)
+
+
+def _preview_entities(prev, seed_face):
+    """
+    additionalEntities for seed_face from the preview prev. The collection is
+    built once per region; a new seed in it only swaps places with the old one.
+    """
+    col = prev['col']
+    job = prev['job']
+    if job is not None and len(prev['faces']) != len(job.order):
+        prev['faces'] = job.faces()  # filled further in idle time since
+        col = None
+    if col is None:
+        graph = prev['classes'].graph
+        col   = _preview_collection(prev['faces'],
+                                    graph.faces[graph.face_index[seed_face.entityToken]])
+    elif prev['seed'] != seed_face:
+        with _perf.phase('highlight'):
+            col.removeByItem(seed_face)
+            col.add(prev['seed'])
+    prev['col']  = col
+    prev['seed'] = seed_face
+    return col
+
+
+def _preview_collection(faces, seed=None):
+    """
+    ObjectCollection of faces except the hovered seed, for additionalEntities.
+    seed is compared by identity: the FaceGraph's own face object.
+    """
+    with _perf.phase('highlight'):
+        return _object_collection([f for f in faces if f is not seed])
+
+
+def _object_collection(items):
+    """ObjectCollection of items, created in one call where the API has createWithArray."""
+    create = getattr(ac.ObjectCollection, 'createWithArray', None)
+    if create is not None:
+        _perf.count()
+        return create(items)
+    col = ac.ObjectCollection.create()
+    for item in items:
+        col.add(item)
+    _perf.count(len(items) + 1)
+    return col
+
+
+def push_selection_steps(faces, chunk=SELECT_CHUNK_FACES):
+    """
+    Generator: replace the active selection with faces. The whole collection
+    is assigned to Selections.all in one call first; where the API does not
+    take it, the faces are added chunk at a time, yielding between chunks so
+    that each runs in its own custom event and the UI stays responsive.
+    Resets _perf and charges the work to the 'select' phase. When done, the
+    push is logged with its wall time from first to last chunk, the number of
+    chunks and whether the bulk assignment took.
+    """
+    _perf.reset()
+    t0   = time.perf_counter()
+    sels = _ui.activeSelections
+    with _perf.phase('select'):
+        sels.clear()
+        try:
+            sels.all = _object_collection(faces)
+            bulk = sels.count == len(faces)
+        except Exception:  # Selections.all is read-only here
+            bulk = False
+        _perf.count(3)
+        if not bulk:
+            sels.clear()
+            _perf.count()
+    n_chunks = 1
+    if not bulk:
+        for start in range(0, len(faces), chunk):
+            if start:
+                n_chunks += 1
+                yield
+            part = faces[start:start + chunk]
+            with _perf.phase('select'):
+                for f in part:
+                    sels.add(f)
+                _perf.count(len(part))
+    wall = time.perf_counter() - t0
+    _report_perf('select', len(faces),
+                 f'bulk={int(bulk)} chunks={n_chunks} wall={wall * 1000:.1f}ms')
+
+
+# ---------- idle work ----------
+
+def _schedule(name, steps, first=False):
+    """
+    Run the step generator steps in time slices on IDLE_EVENT_ID.
+    Replaces any task of the same name; first puts it ahead of queued tasks.
+    """
+    tasks = _shared.setdefault('tasks', collections.OrderedDict())
+    tasks[name] = steps
+    tasks.move_to_end(name, last=not first)
+    if not _shared.get('idle_fired'):
+        _shared['idle_fired'] = _app.fireCustomEvent(IDLE_EVENT_ID, '')
+
+
+def _cancel(name):
+    _shared.get('tasks', {}).pop(name, None)
+
+
+def _finish_preview(job, body_tok):
+    """Idle task: complete a budgeted preview fill, then flag the highlight for refresh."""
+    while not job.run(max_faces=256):
+        yield
+    _cache_region(body_tok, job)
+    prev = _shared.get('preview')
+    if _shared.get('job') is job and prev and prev['job'] is job:
+        prev['faces'] = job.faces()
+        prev['col']   = None
+        if _shared.get('hover_tok'):  # still hovering the region
+            _shared['faces'] = prev['faces']
+            if job.parents is not None:
+                _shared['lineage'] = job.lineage({})
+            _shared['preview_refresh'] = _shared['hover_tok']
+
+
+def _precompute_body(body):
+    """
+    Idle task: build the FaceGraph of body, its EdgeClasses view at the current
+    tolerance and that view's region labels. Starts the preview of a seed that
+    was hovered on this body while it was not ready yet.
+    """
+    body_tok = body.entityToken
+    entry    = _body_cache(body, body_tok)
+    if _current_graph(body_tok, entry) is None:
+        precision = _shared.get('precision', PRECISION)
+        graph = yield from build_face_graph_steps(
+            body, cache=_edge_cache_file(body_tok, entry, precision), precision=precision)
+        entry = _body_cache(body, body_tok)  # touched, or back if evicted meanwhile
+        if _current_graph(body_tok, entry) is None:  # not built synchronously meanwhile
+            _keep_graph(body_tok, entry, graph)
+    graph = _entry_graph(body_tok, entry)
+    tol   = _shared['tol']
+    while True:
+        classes = _classes_for(body, tol)
+        waiting = _shared.get('waiting')
+        if waiting and waiting[0] == body_tok:
+            _shared['waiting'] = None
+            mode = _shared.get('mode', 'concave')
+            job  = FloodFill(classes, graph.face_index[waiting[1]], mode, _shared.get('debug'))
+            _shared['job'] = job
+            _set_preview(classes, mode, job.faces(), job=job)
+            _schedule('preview', _finish_preview(job, body_tok), first=True)
+        if classes.regions is None:
+            # Labelling tests every tangent edge for G2; sample them in slices first
+            yield from classes.resolve_g2_steps()
+            _save_edge_cache(body_tok, entry)
+            classes.regions = yield from label_regions_steps(classes)
+        if _shared['tol'] == tol:
+            return
+        tol = _shared['tol']  # changed while this task ran
+
+
+def _precompute(body, first=False):
+    """Schedule _precompute_body of body, or move its pending task to the front."""
+    name  = f'body-{body.entityToken}'
+    steps = _shared.get('tasks', {}).get(name)
+    _schedule(name, steps or _precompute_body(body), first)
+
+
+def _design_bodies(first=None, limit=None):
+    """
+    Up to limit (default _WARM_BODIES) visible solid bodies of the active design
+    to precompute: first (the hovered body) if given, then the root component's,
+    then those of the first occurrence of each other component. Further
+    occurrences of a component are left to be built when hovered.
+    """
+    design = af.Design.cast(_app.activeProduct)
+    if not design:
+        return []
+    if limit is None:
+        limit = _WARM_BODIES
+    root      = design.rootComponent
+    bodies    = [first] if first is not None else []
+    first_tok = first.entityToken if first is not None else None
+    seen      = set()
+    groups = [root.bRepBodies]
+    for occ in root.allOccurrences:
+        comp_id = occ.component.id
+        if comp_id not in seen:
+            seen.add(comp_id)
+            groups.append(occ.bRepBodies)
+    for group in groups:
+        for b in group:
+            if len(bodies) >= limit:
+                return bodies
+            if b.isSolid and b.isVisible and (first_tok is None or b.entityToken != first_tok):
+                bodies.append(b)
+    return bodies
 
 
 # ---------- command handlers ----------
@@ -454,13 +2571,7 @@ class CommandDestroyHandler(ac.CommandEventHandler):
     def __init__(self): super().__init__()
     def notify(self, args):
         try:
-            # Clear face index debug graphics
-            design = af.Design.cast(_app.activeProduct)
-            if design:
-                grps = design.rootComponent.customGraphicsGroups
-                for gi in range(grps.count - 1, -1, -1):
-                    grps.item(gi).deleteMe()
-                _app.activeViewport.refresh()
+            _clear_face_indices()
         except:
             pass
         try:
@@ -472,12 +2583,16 @@ class CommandDestroyHandler(ac.CommandEventHandler):
                     except:
                         pass
                     custom_event = _app.registerCustomEvent(CUSTOM_EVENT_ID)
+                    _shared.pop('inputs', None)  # the dialog is gone; the push is timed in the log
+                    steps = push_selection_steps(faces)
                     class OnPostSelect(ac.CustomEventHandler):
                         def notify(self, args):
                             try:
-                                _ui.activeSelections.clear()
-                                for f in faces:
-                                    _ui.activeSelections.add(f)
+                                next(steps)
+                                _app.fireCustomEvent(CUSTOM_EVENT_ID, '')  # next chunk
+                                return
+                            except StopIteration:
+                                pass
                             except:
                                 _ui.messageBox(traceback.format_exc())
                             _app.unregisterCustomEvent(CUSTOM_EVENT_ID)
@@ -487,6 +2602,18 @@ class CommandDestroyHandler(ac.CommandEventHandler):
                     _app.fireCustomEvent(CUSTOM_EVENT_ID, '')
         except:
             _ui.messageBox(traceback.format_exc())
+        for steps in _shared.pop('tasks', {}).values():
+            steps.close()
+        # G2 samples taken on demand since the last write
+        for body_tok, entry in _shared.get('_checked_bodies', {}).items():
+            try:
+                _save_edge_cache(body_tok, entry)
+            except:
+                pass
+        try:
+            _app.unregisterCustomEvent(IDLE_EVENT_ID)
+        except:
+            pass
         adsk.terminate()
 
 class PreSelectHandler(ac.SelectionEventHandler):
@@ -496,24 +2623,87 @@ class PreSelectHandler(ac.SelectionEventHandler):
             if _shared.get('locked'): return
             face = af.BRepFace.cast(args.selection.entity)
             if not face: return
+            _perf.reset()
             mode  = _shared.get('mode', 'concave')
             tol   = _shared.get('tol', math.cos(math.radians(0.1)))
-            lineage = {} if _shared.get('debug') else None
-            # Build face index graphics once per body when debug is on
-            if _shared.get('debug'):
-                body_tok = face.body.entityToken
-                gfx_cache = _shared.setdefault('_gfx_cache', set())
-                if body_tok not in gfx_cache:
-                    _build_face_index_graphics(face.body)
-                    gfx_cache.add(body_tok)
-            faces = flood_fill(face, mode, tol, lineage)
+            debug   = _shared.get('debug')
+            lineage = {} if debug else None
+            seed_tok = face.entityToken
+            body     = face.body
+            body_tok = body.entityToken
+            graph    = _current_graph(body_tok, _body_cache(body, body_tok))
+            _shared['hover_tok']       = seed_tok
+            _shared['preview_refresh'] = None
+            _shared['waiting']         = None
+            now      = time.perf_counter()
+            sweeping = now - _shared.get('hover_t', -1.0) < COALESCE_SECONDS
+            _shared['hover_t'] = now
+            if graph is None and f'body-{body_tok}' not in _shared.get('failed_tasks', ()):
+                # Body graph still being extracted in idle time: highlight the
+                # seed only, the region follows when its task has the graph.
+                _shared['waiting'] = (body_tok, seed_tok)
+                _shared['job']     = None
+                _shared['faces']   = [face]
+                _shared['lineage'] = lineage
+                _cancel('preview')
+                _precompute(body, first=True)
+                return
+            classes = _classes_for(body, tol)
+            fi      = classes.graph.face_index[seed_tok]
+            # The lineage tree needs the BFS rooted at this seed; otherwise a face of
+            # the last region reuses it, and other regions are a label lookup once
+            # the body's labels have been built in idle time, or a region cache hit.
+            prev = None if debug else _reusable_preview(classes, mode, fi)
+            if prev is None and not debug:
+                prev = _stored_preview(body_tok, classes, mode, fi)
+                if prev is not None:
+                    _shared['job'] = None
+                    _cancel('preview')
+            if prev is None:
+                job = FloodFill(classes, fi, mode, debug)
+                _shared['job'] = job
+                if sweeping and not debug:
+                    # Mid-sweep: fill in idle time, where the next hover's fill replaces it
+                    _schedule('preview', _finish_preview(job, body_tok), first=True)
+                elif job.run(PREVIEW_MAX_FACES, PREVIEW_MAX_SECONDS):
+                    _cancel('preview')
+                    _cache_region(body_tok, job)
+                else:
+                    _schedule('preview', _finish_preview(job, body_tok), first=True)
+                if debug:
+                    lineage = job.lineage(lineage)
+                    _show_face_indices(body, job.order)
+                elif f'body-{body_tok}' not in _shared.get('tasks', {}):
+                    _precompute(body)
+                prev = _set_preview(classes, mode, job.faces(), job=job)
+            faces = prev['faces']
             _shared['faces']   = faces
             _shared['lineage'] = lineage
-            col = ac.ObjectCollection.create()
-            for f in faces:
-                if f.entityToken != face.entityToken:
-                    col.add(f)
-            args.additionalEntities = col
+            args.additionalEntities = _preview_entities(prev, face)
+            _report_perf('hover', len(faces))
+        except:
+            _ui.messageBox(traceback.format_exc())
+
+class PreSelectMouseMoveHandler(ac.SelectionEventHandler):
+    """Re-highlights the hovered seed's region once an idle task has completed it."""
+    def __init__(self): super().__init__()
+    def notify(self, args):
+        try:
+            seed_tok = _shared.get('preview_refresh')
+            if not seed_tok or _shared.get('locked'): return
+            face = af.BRepFace.cast(args.selection.entity)
+            if not face or face.entityToken != seed_tok: return
+            _shared['preview_refresh'] = None
+            prev = _shared.get('preview')
+            if prev:
+                args.additionalEntities = _preview_entities(prev, face)
+            else:
+                args.additionalEntities = _preview_collection(
+                    [f for f in _shared.get('faces', []) if f.entityToken != seed_tok])
+            job = _shared.get('job')
+            if _shared.get('debug') and job is not None:
+                _show_face_indices(face.body, job.order)
+                _report_perf('preview', len(job.order))
         except:
             _ui.messageBox(traceback.format_exc())
 
@@ -522,10 +2712,45 @@ class PreSelectEndHandler(ac.SelectionEventHandler):
     def notify(self, args):
         try:
             if not _shared.get('locked'):
+                # The last region and its fill are kept: the next hover may reuse them
                 _shared['faces'] = []
+                _shared['hover_tok']       = None
+                _shared['preview_refresh'] = None
+                _shared['waiting']         = None
         except:
             _ui.messageBox(traceback.format_exc())
 
+class IdleHandler(ac.CustomEventHandler):
+    """
+    Runs scheduled tasks for up to IDLE_SLICE_SECONDS, then re-fires while any remain.
+    A task that raises is dropped on its own and logged with _dbg; a body whose
+    task failed is built synchronously on hover, where the error is shown.
+    """
+    def __init__(self): super().__init__()
+    def notify(self, args):
+        try:
+            _shared['idle_fired'] = False
+            tasks    = _shared.get('tasks')
+            deadline = time.perf_counter() + IDLE_SLICE_SECONDS
+            while tasks and time.perf_counter() < deadline:
+                name, steps = next(iter(tasks.items()))
+                try:
+                    with _perf.phase('idle:' + name.split('-')[0]):
+                        next(steps)
+                except StopIteration:
+                    if tasks.get(name) is steps:
+                        del tasks[name]
+                except Exception:
+                    if tasks.get(name) is steps:
+                        del tasks[name]
+                    _shared.setdefault('failed_tasks', set()).add(name)
+                    _dbg(f'Idle task {name} failed:\n{traceback.format_exc()}')
+            if tasks:
+                _shared['idle_fired'] = _app.fireCustomEvent(IDLE_EVENT_ID, '')
+        except:
+            _shared.pop('tasks', None)
+            _ui.messageBox(traceback.format_exc())
+
 class SelectHandler(ac.SelectionEventHandler):
     def __init__(self): super().__init__()
     def notify(self, args):
@@ -533,37 +2758,41 @@ class SelectHandler(ac.SelectionEventHandler):
             if not _shared.get('locked'):
                 _shared['locked'] = True
                 _shared['inputs'].itemById('lbl').text = ''
+                # The click locks the complete region, even if the preview was partial
+                # or the body was still being classified in idle time
+                waiting = _shared.get('waiting')
+                if waiting:
+                    # Only the seed's region is needed now: its graph is built here and
+                    # the body's G2 resolution and labels are left to a new idle task
+                    _shared['waiting'] = None
+                    body_tok, seed_tok = waiting
+                    body = af.BRepFace.cast(args.selection.entity).body
+                    _cancel(f'body-{body_tok}')
+                    _graph_for(body, body_tok)
+                    classes = _classes_for(body, _shared['tol'])
+                    _shared['job'] = FloodFill(classes, classes.graph.face_index[seed_tok],
+                                               _shared.get('mode', 'concave'), _shared.get('debug'))
+                    _precompute(body)
+                job = _shared.get('job')
+                if job is not None and not job.done:
+                    job.run()
+                    _shared['faces'] = job.faces()
+                    if job.parents is not None:
+                        _shared['lineage'] = job.lineage({})
+                    _cache_region(af.BRepFace.cast(args.selection.entity).body.entityToken, job)
+                _cancel('preview')
+                _report_perf('lock', len(_shared.get('faces', [])))
                 if _shared.get("debug"):
                     lineage = _shared.get('lineage', {})
                     faces = _shared.get('faces', [])
                     mode  = _shared.get('mode', '')
                     seed  = faces[0] if faces else af.BRepFace.cast(args.selection.entity)
-                    _app.log('---')
-                    _app.log(f'Mode: {mode}  Seed: {_face_desc(seed)}  Found: {len(faces)} faces')
-                    body_faces = list(seed.body.faces)
-                    def face_idx(f):
-                        try: return next(i for i,bf in enumerate(body_faces) if bf.entityToken == f.entityToken)
-                        except StopIteration: return -1
-                    def short_desc(f):
-                        st   = _SURF_NAMES.get(f.geometry.surfaceType, str(f.geometry.surfaceType))
-                        curv = is_curved_face(f)
-                        conc = is_face_concave(f) if curv else None
-                        cs   = 'concave' if conc == True else 'convex' if conc == False else 'flat'
-                        return f'{st}({cs})'
-                    from collections import defaultdict
-                    children = defaultdict(list)
-                    for f in faces:
-                        parent_tok, rule, _ = lineage.get(f.entityToken, (None, "?", 0))
-                        children[parent_tok].append((f, rule))
-                    seed_idx = face_idx(seed)
-                    _app.log(f"[{seed_idx}] {short_desc(seed)} [seed]")
-                    def print_tree(f, ind):
-                        pidx = face_idx(f)
-                        for child, rule in children.get(f.entityToken, []):
-                            cidx = face_idx(child)
-                            _app.log(f"{ind}[{pidx}]->[{cidx}] {short_desc(child)} [{rule}]")
-                            print_tree(child, ind + "        ")
-                    print_tree(seed, "        ")
+                    graph = _graph_for(seed.body)
+                    if job is not None:
+                        _show_face_indices(seed.body, job.order)
+                    _app.log(render_lineage(seed, faces, lineage, graph, mode))
+                    if LINEAGE_FILE:
+                        write_lineage(LINEAGE_FILE, lineage_records(faces, lineage, graph), mode)
         except:
             _ui.messageBox(traceback.format_exc())
 
@@ -577,9 +2806,26 @@ class InputChangedHandler(ac.InputChangedEventHandler):
             if changed_id in ('mode', 'tol'):
                 _shared['mode'] = mode_map[inputs.itemById('mode').selectedItem.name]
                 _shared['tol']  = math.cos(inputs.itemById('tol').value)
-                _shared.pop('_edge_cache', None)  # invalidate all body caches on tol change
+                _shared['job']  = None
+                _shared['preview'] = None
+                _cancel('preview')
+                # Edge caches hold tolerance-independent measurements; a new tol only re-thresholds them
+            if changed_id == 'precision':
+                # Graphs are rebuilt at the new sample counts, in idle time
+                _shared['precision'] = inputs.itemById('precision').selectedItem.name.lower()
+                _shared['job']     = None
+                _shared['preview'] = None
+                _cancel('preview')
+                for name in [n for n in _shared.get('tasks', {}) if n.startswith('body-')]:
+                    _cancel(name)
+                faces = _shared.get('faces')
+                for body in _design_bodies(faces[0].body if faces else None):
+                    _precompute(body)
             if changed_id == 'debug':
                 _shared['debug'] = inputs.itemById('debug').value
+                inputs.itemById('perf').isVisible = _shared['debug']
+                if not _shared['debug']:
+                    _clear_face_indices()
             if changed_id in ('mode', 'tol', 'seed'):
                 sel = inputs.itemById('seed')
                 if sel.selectionCount == 0:
@@ -593,6 +2839,7 @@ class CommandCreatedHandler(ac.CommandCreatedEventHandler):
     def __init__(self): super().__init__()
     def notify(self, args):
         try:
+            drop_document_caches()
             cmd    = ac.Command.cast(args.command)
             inputs = cmd.commandInputs
 
@@ -600,24 +2847,38 @@ class CommandCreatedHandler(ac.CommandCreatedEventHandler):
             _shared['faces']  = []
             _shared['mode']   = 'concave'
             _shared['tol']    = math.cos(math.radians(0.1))
+            _shared['precision'] = PRECISION
             _shared['debug']  = False
             _shared['inputs'] = inputs
 
             onExecute     = CommandExecuteHandler()
             onDestroy     = CommandDestroyHandler()
             onPreSelect   = PreSelectHandler()
+            onPreSelMove  = PreSelectMouseMoveHandler()
             onPreSelEnd   = PreSelectEndHandler()
             onSelect      = SelectHandler()
             onInputChange = InputChangedHandler()
             cmd.execute.add(onExecute)
             cmd.destroy.add(onDestroy)
             cmd.preSelect.add(onPreSelect)
+            cmd.preSelectMouseMove.add(onPreSelMove)
             cmd.preSelectEnd.add(onPreSelEnd)
             cmd.select.add(onSelect)
             cmd.inputChanged.add(onInputChange)
-            _handlers.extend([onExecute, onDestroy, onPreSelect,
+            _handlers.extend([onExecute, onDestroy, onPreSelect, onPreSelMove,
                               onPreSelEnd, onSelect, onInputChange])
 
+            try:
+                _app.unregisterCustomEvent(IDLE_EVENT_ID)
+            except:
+                pass
+            onIdle = IdleHandler()
+            _app.registerCustomEvent(IDLE_EVENT_ID).add(onIdle)
+            _handlers.append(onIdle)
+            # Classify the design's bodies while the user moves to a seed face
+            for body in _design_bodies():
+                _precompute(body)
+
             inputs.addTextBoxCommandInput('lbl', '', 'Select Seed Face', 1, True)
             sel = inputs.addSelectionInput('seed', '', 'Hover to preview, click to lock')
             sel.addSelectionFilter('SolidFaces')
@@ -632,7 +2893,14 @@ class CommandCreatedHandler(ac.CommandCreatedEventHandler):
                 'tol', 'Tangent Tolerance', 'deg',
                 ac.ValueInput.createByString('0.1 deg'))
 
+            dd = inputs.addDropDownCommandInput(
+                'precision', 'Edge Sampling', ac.DropDownStyles.TextListDropDownStyle)
+            for name in PRECISIONS:
+                dd.listItems.add(name.capitalize(), name == _shared['precision'])
+
             inputs.addBoolValueInput('debug', 'Debug', True, '', False)
+            perf = inputs.addTextBoxCommandInput('perf', 'Timing', '', 8, True)
+            perf.isVisible = False
 
         except:
             _ui.messageBox(traceback.format_exc())
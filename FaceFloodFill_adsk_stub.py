@@ -0,0 +1,1204 @@
+"""
+Stand-in for the subset of adsk.core / adsk.fusion used by FaceFloodFill.py,
+so the flood-fill engine can be run and measured outside Fusion.
+
+install() registers the fake 'adsk', 'adsk.core' and 'adsk.fusion' modules in
+sys.modules.  It must be called before FaceFloodFill is imported.
+
+Synthetic bodies are built from analytic surfaces (plane, cylinder, sphere,
+torus), optionally reported as NurbsSurface to exercise the NURBS code paths.
+Every evaluator call and every property read that would be an API round trip
+in Fusion is counted in API_CALLS, keyed 'Class.member'.
+
+Curvature sign convention matches the one assumed by is_face_concave:
+positive when the surface bends toward its outward normal (concave).
+
+261016: First version.
+"""
+
+import collections
+import math
+import sys
+import time
+import types
+
+
+API_CALLS = collections.Counter()
+_latency = [0.0]
+
+
+def set_latency(seconds):
+    """Busy-wait this long on every counted call to emulate API round-trip cost."""
+    _latency[0] = seconds
+
+
+def reset_counts():
+    API_CALLS.clear()
+
+
+def _api(name):
+    API_CALLS[name] += 1
+    if _latency[0]:
+        end = time.perf_counter() + _latency[0]
+        while time.perf_counter() < end:
+            pass
+
+
+# ---------- vector math on plain tuples ----------
+
+def _add(a, b): return (a[0]+b[0], a[1]+b[1], a[2]+b[2])
+def _sub(a, b): return (a[0]-b[0], a[1]-b[1], a[2]-b[2])
+def _mul(a, s): return (a[0]*s, a[1]*s, a[2]*s)
+def _dot(a, b): return a[0]*b[0] + a[1]*b[1] + a[2]*b[2]
+def _cross(a, b):
+    return (a[1]*b[2] - a[2]*b[1], a[2]*b[0] - a[0]*b[2], a[0]*b[1] - a[1]*b[0])
+def _unit(a):
+    n = math.sqrt(_dot(a, a))
+    return (a[0]/n, a[1]/n, a[2]/n) if n > 1e-300 else (0.0, 0.0, 0.0)
+
+
+# ---------- adsk.core value types ----------
+
+class Point2D:
+    __slots__ = ('x', 'y')
+    def __init__(self, x, y): self.x, self.y = x, y
+    @staticmethod
+    def create(x=0.0, y=0.0): return Point2D(x, y)
+
+
+class Point3D:
+    __slots__ = ('x', 'y', 'z')
+    def __init__(self, x, y, z): self.x, self.y, self.z = x, y, z
+    @staticmethod
+    def create(x=0.0, y=0.0, z=0.0): return Point3D(x, y, z)
+    def asArray(self): return (self.x, self.y, self.z)
+    def distanceTo(self, other):
+        return math.sqrt((self.x-other.x)**2 + (self.y-other.y)**2 + (self.z-other.z)**2)
+    def copy(self): return Point3D(self.x, self.y, self.z)
+
+
+class Vector3D:
+    __slots__ = ('x', 'y', 'z')
+    def __init__(self, x, y, z): self.x, self.y, self.z = x, y, z
+    @staticmethod
+    def create(x=0.0, y=0.0, z=0.0): return Vector3D(x, y, z)
+    def asArray(self): return (self.x, self.y, self.z)
+    def dotProduct(self, v): return self.x*v.x + self.y*v.y + self.z*v.z
+    def crossProduct(self, v):
+        return Vector3D(*_cross((self.x, self.y, self.z), (v.x, v.y, v.z)))
+    @property
+    def length(self): return math.sqrt(self.x*self.x + self.y*self.y + self.z*self.z)
+    def normalize(self):
+        n = self.length
+        if n < 1e-300: return False
+        self.x, self.y, self.z = self.x/n, self.y/n, self.z/n
+        return True
+    def copy(self): return Vector3D(self.x, self.y, self.z)
+
+
+class BoundingBox2D:
+    def __init__(self, minPoint, maxPoint): self.minPoint, self.maxPoint = minPoint, maxPoint
+
+
+class Matrix3D:
+    def __init__(self): self.translation = Vector3D(0.0, 0.0, 0.0)
+    @staticmethod
+    def create(): return Matrix3D()
+
+
+class ObjectCollection:
+    def __init__(self): self._items = []
+    @staticmethod
+    def create(): return ObjectCollection()
+    @staticmethod
+    def createWithArray(items):
+        _api('ObjectCollection.createWithArray')
+        col = ObjectCollection()
+        col._items = list(items)
+        return col
+    def add(self, item):
+        _api('ObjectCollection.add')
+        self._items.append(item)
+        return True
+    def removeByItem(self, item):
+        _api('ObjectCollection.removeByItem')
+        if item in self._items:
+            self._items.remove(item)
+            return True
+        return False
+    @property
+    def count(self): return len(self._items)
+    def item(self, i): return self._items[i]
+    def __iter__(self): return iter(self._items)
+    def __len__(self): return len(self._items)
+
+
+class _Enum:
+    def __init__(self, **members): self.__dict__.update(members)
+
+
+SurfaceTypes = _Enum(
+    PlaneSurfaceType=0, CylinderSurfaceType=1, ConeSurfaceType=2,
+    SphereSurfaceType=3, TorusSurfaceType=4, EllipticalCylinderSurfaceType=5,
+    EllipticalConeSurfaceType=6, NurbsSurfaceType=7)
+
+Curve3DTypes = _Enum(
+    Line3DCurveType=0, Arc3DCurveType=1, Circle3DCurveType=2,
+    Ellipse3DCurveType=3, EllipticalArc3DCurveType=4,
+    InfiniteLine3DCurveType=5, NurbsCurve3DCurveType=6)
+
+CommandTerminationReason = _Enum(
+    UnknownTerminationReason=0, CompletedTerminationReason=1,
+    CancelledTerminationReason=2, AbortedTerminationReason=3,
+    PreEmptedTerminationReason=4, SessionEndingTerminationReason=5)
+
+
+# ---------- surfaces ----------
+
+class _Surface:
+    """Analytic surface. sense=+1 keeps the natural (outward) normal, -1 flips it."""
+    surfaceType = None
+
+    @classmethod
+    def cast(cls, obj):
+        return obj if isinstance(obj, cls) else None
+
+
+class Plane(_Surface):
+    surfaceType = SurfaceTypes.PlaneSurfaceType
+
+    def __init__(self, origin, normal, udir):
+        self._o = origin
+        self._n = _unit(normal)
+        self._u = _unit(udir)
+        self._v = _cross(self._n, self._u)
+
+    @property
+    def origin(self): return Point3D(*self._o)
+    @property
+    def normal(self): return Vector3D(*self._n)
+
+    def _param(self, p):
+        d = _sub(p, self._o)
+        return _dot(d, self._u), _dot(d, self._v)
+
+    def _point(self, u, v):
+        return _add(self._o, _add(_mul(self._u, u), _mul(self._v, v)))
+
+    def _normal(self, u, v): return self._n
+
+    def _curv(self, u, v, sense): return self._u, 0.0, 0.0
+
+    def getData(self):
+        _api('Plane.getData')
+        return True, self.origin, self.normal, Vector3D(*self._u), Vector3D(*self._v)
+
+
+class Cylinder(_Surface):
+    surfaceType = SurfaceTypes.CylinderSurfaceType
+
+    def __init__(self, origin, axis, radius, refdir):
+        self._o = origin
+        self._a = _unit(axis)
+        self._r = radius
+        self._x = _unit(refdir)
+        self._y = _cross(self._a, self._x)
+
+    @property
+    def origin(self): return Point3D(*self._o)
+    @property
+    def axis(self): return Vector3D(*self._a)
+    @property
+    def radius(self): return self._r
+
+    def getData(self):
+        _api('Cylinder.getData')
+        return True, self.origin, self.axis, self._r
+
+    def _param(self, p):
+        d = _sub(p, self._o)
+        return math.atan2(_dot(d, self._y), _dot(d, self._x)), _dot(d, self._a)
+
+    def _radial(self, u):
+        return _add(_mul(self._x, math.cos(u)), _mul(self._y, math.sin(u)))
+
+    def _point(self, u, v):
+        return _add(self._o, _add(_mul(self._radial(u), self._r), _mul(self._a, v)))
+
+    def _normal(self, u, v): return self._radial(u)
+
+    def _curv(self, u, v, sense):
+        tan = _add(_mul(self._x, -math.sin(u)), _mul(self._y, math.cos(u)))
+        return tan, -sense / self._r, 0.0
+
+
+class Sphere(_Surface):
+    surfaceType = SurfaceTypes.SphereSurfaceType
+
+    def __init__(self, origin, radius, refdir, axis):
+        self._o = origin
+        self._r = radius
+        self._z = _unit(axis)
+        self._x = _unit(refdir)
+        self._y = _cross(self._z, self._x)
+
+    @property
+    def origin(self): return Point3D(*self._o)
+    @property
+    def radius(self): return self._r
+
+    def getData(self):
+        _api('Sphere.getData')
+        return True, self.origin, self._r
+
+    def _param(self, p):
+        d = _unit(_sub(p, self._o))
+        return (math.atan2(_dot(d, self._y), _dot(d, self._x)),
+                math.asin(max(-1.0, min(1.0, _dot(d, self._z)))))
+
+    def _normal(self, u, v):
+        cv = math.cos(v)
+        return _add(_add(_mul(self._x, cv*math.cos(u)), _mul(self._y, cv*math.sin(u))),
+                    _mul(self._z, math.sin(v)))
+
+    def _point(self, u, v):
+        return _add(self._o, _mul(self._normal(u, v), self._r))
+
+    def _curv(self, u, v, sense):
+        tan = _add(_mul(self._x, -math.sin(u)), _mul(self._y, math.cos(u)))
+        k = -sense / self._r
+        return tan, k, k
+
+
+class Torus(_Surface):
+    surfaceType = SurfaceTypes.TorusSurfaceType
+
+    def __init__(self, origin, axis, majorRadius, minorRadius, refdir):
+        self._o = origin
+        self._a = _unit(axis)
+        self._R = majorRadius
+        self._r = minorRadius
+        self._x = _unit(refdir)
+        self._y = _cross(self._a, self._x)
+
+    @property
+    def origin(self): return Point3D(*self._o)
+    @property
+    def axis(self): return Vector3D(*self._a)
+    @property
+    def majorRadius(self): return self._R
+    @property
+    def minorRadius(self): return self._r
+
+    def getData(self):
+        _api('Torus.getData')
+        return True, self.origin, self.axis, self._R, self._r
+
+    def _param(self, p):
+        d  = _sub(p, self._o)
+        u  = math.atan2(_dot(d, self._y), _dot(d, self._x))
+        rd = _add(_mul(self._x, math.cos(u)), _mul(self._y, math.sin(u)))
+        w  = _sub(d, _mul(rd, self._R))
+        return u, math.atan2(_dot(w, self._a), _dot(w, rd))
+
+    def _normal(self, u, v):
+        rd = _add(_mul(self._x, math.cos(u)), _mul(self._y, math.sin(u)))
+        return _add(_mul(rd, math.cos(v)), _mul(self._a, math.sin(v)))
+
+    def _point(self, u, v):
+        rd = _add(_mul(self._x, math.cos(u)), _mul(self._y, math.sin(u)))
+        return _add(self._o, _add(_mul(rd, self._R), _mul(self._normal(u, v), self._r)))
+
+    def _curv(self, u, v, sense):
+        k_tube = -sense / self._r
+        k_ring = -sense * math.cos(v) / (self._R + self._r*math.cos(v))
+        rd = _add(_mul(self._x, math.cos(u)), _mul(self._y, math.sin(u)))
+        tube_dir = _sub(_mul(self._a, math.cos(v)), _mul(rd, math.sin(v)))
+        ring_dir = _add(_mul(self._x, -math.sin(u)), _mul(self._y, math.cos(u)))
+        if abs(k_tube) >= abs(k_ring):
+            return tube_dir, k_tube, k_ring
+        return ring_dir, k_ring, k_tube
+
+
+class Cone(_Surface):
+    """Radius `radius` at origin, narrowing along axis at halfAngle (radians)."""
+    surfaceType = SurfaceTypes.ConeSurfaceType
+
+    def __init__(self, origin, axis, radius, halfAngle, refdir):
+        self._o  = origin
+        self._a  = _unit(axis)
+        self._r  = radius
+        self._ha = halfAngle
+        self._x  = _unit(refdir)
+        self._y  = _cross(self._a, self._x)
+
+    @property
+    def origin(self): return Point3D(*self._o)
+    @property
+    def axis(self): return Vector3D(*self._a)
+    @property
+    def radius(self): return self._r
+    @property
+    def halfAngle(self): return self._ha
+
+    def getData(self):
+        _api('Cone.getData')
+        return True, self.origin, self.axis, self._r, self._ha
+
+    def _radial(self, u):
+        return _add(_mul(self._x, math.cos(u)), _mul(self._y, math.sin(u)))
+
+    def _param(self, p):
+        d = _sub(p, self._o)
+        return math.atan2(_dot(d, self._y), _dot(d, self._x)), _dot(d, self._a)
+
+    def _point(self, u, v):
+        rho = self._r - v * math.tan(self._ha)
+        return _add(self._o, _add(_mul(self._radial(u), rho), _mul(self._a, v)))
+
+    def _normal(self, u, v):
+        return _add(_mul(self._radial(u), math.cos(self._ha)), _mul(self._a, math.sin(self._ha)))
+
+    def _curv(self, u, v, sense):
+        tan = _add(_mul(self._x, -math.sin(u)), _mul(self._y, math.cos(u)))
+        rho = self._r - v * math.tan(self._ha)
+        return tan, -sense * math.cos(self._ha) / rho, 0.0
+
+
+class EllipticalCylinder(_Surface):
+    surfaceType = SurfaceTypes.EllipticalCylinderSurfaceType
+
+class EllipticalCone(_Surface):
+    surfaceType = SurfaceTypes.EllipticalConeSurfaceType
+
+
+class NurbsSurface(_Surface):
+    """An analytic surface reported as NURBS (e.g. a blend face)."""
+    surfaceType = SurfaceTypes.NurbsSurfaceType
+
+    def __init__(self, exact):
+        self._exact = exact
+
+    def _param(self, p): return self._exact._param(p)
+    def _point(self, u, v): return self._exact._point(u, v)
+    def _normal(self, u, v): return self._exact._normal(u, v)
+    def _curv(self, u, v, sense): return self._exact._curv(u, v, sense)
+
+
+class SurfaceEvaluator:
+    def __init__(self, face):
+        self._face = face
+
+    def _uv(self, p):
+        face = self._face
+        u, v = face._surf._param(p)
+        # Choose the periodic branch of u nearest the face's own range.
+        if face._periodic_u:
+            mid = (face._range[0] + face._range[1]) * 0.5
+            u += 2.0*math.pi * round((mid - u) / (2.0*math.pi))
+        return u, v
+
+    def _n(self, u, v):
+        n = self._face._surf._normal(u, v)
+        return Vector3D(*_mul(n, self._face._sense))
+
+    def _k(self, u, v):
+        tan, kmax, kmin = self._face._surf._curv(u, v, self._face._sense)
+        return Vector3D(*tan), kmax, kmin
+
+    def parametricRange(self):
+        _api('SurfaceEvaluator.parametricRange')
+        r = self._face._range
+        return BoundingBox2D(Point2D(r[0], r[2]), Point2D(r[1], r[3]))
+
+    def getNormalAtPoint(self, point):
+        _api('SurfaceEvaluator.getNormalAtPoint')
+        return True, self._n(*self._uv((point.x, point.y, point.z)))
+
+    def getNormalsAtPoints(self, points):
+        _api('SurfaceEvaluator.getNormalsAtPoints')
+        return True, [self._n(*self._uv((p.x, p.y, p.z))) for p in points]
+
+    def getNormalAtParameter(self, parameter):
+        _api('SurfaceEvaluator.getNormalAtParameter')
+        return True, self._n(parameter.x, parameter.y)
+
+    def getNormalsAtParameters(self, parameters):
+        _api('SurfaceEvaluator.getNormalsAtParameters')
+        return True, [self._n(p.x, p.y) for p in parameters]
+
+    def getParameterAtPoint(self, point):
+        _api('SurfaceEvaluator.getParameterAtPoint')
+        return True, Point2D(*self._uv((point.x, point.y, point.z)))
+
+    def getParametersAtPoints(self, points):
+        _api('SurfaceEvaluator.getParametersAtPoints')
+        return True, [Point2D(*self._uv((p.x, p.y, p.z))) for p in points]
+
+    def getPointAtParameter(self, parameter):
+        _api('SurfaceEvaluator.getPointAtParameter')
+        return True, Point3D(*self._face._surf._point(parameter.x, parameter.y))
+
+    def getPointsAtParameters(self, parameters):
+        _api('SurfaceEvaluator.getPointsAtParameters')
+        return True, [Point3D(*self._face._surf._point(p.x, p.y)) for p in parameters]
+
+    def getCurvature(self, parameter):
+        _api('SurfaceEvaluator.getCurvature')
+        tan, kmax, kmin = self._k(parameter.x, parameter.y)
+        return True, tan, kmax, kmin
+
+    def getCurvatures(self, parameters):
+        _api('SurfaceEvaluator.getCurvatures')
+        tans, kmaxs, kmins = [], [], []
+        for p in parameters:
+            tan, kmax, kmin = self._k(p.x, p.y)
+            tans.append(tan)
+            kmaxs.append(kmax)
+            kmins.append(kmin)
+        return True, tans, kmaxs, kmins
+
+
+# ---------- curves ----------
+
+class Line3D:
+    curveType = Curve3DTypes.Line3DCurveType
+
+    def __init__(self, p0, p1):
+        self._p0, self._p1 = p0, p1
+        self._len = math.sqrt(_dot(_sub(p1, p0), _sub(p1, p0)))
+
+    def _point(self, t): return _add(self._p0, _mul(_sub(self._p1, self._p0), t))
+    def _tangent(self, t): return _unit(_sub(self._p1, self._p0))
+
+
+class Arc3D:
+    curveType = Curve3DTypes.Arc3DCurveType
+
+    def __init__(self, center, normal, refdir, radius, sweep):
+        self._c = center
+        self._x = _unit(refdir)
+        self._y = _cross(_unit(normal), self._x)
+        self._r = radius
+        self._sweep = sweep
+        self._len = abs(radius * sweep)
+
+    def _point(self, t):
+        a = self._sweep * t
+        return _add(self._c, _mul(_add(_mul(self._x, math.cos(a)), _mul(self._y, math.sin(a))), self._r))
+
+    def _tangent(self, t):
+        a = self._sweep * t
+        d = _add(_mul(self._x, -math.sin(a)), _mul(self._y, math.cos(a)))
+        return d if self._sweep >= 0 else _mul(d, -1.0)
+
+
+class CurveEvaluator3D:
+    def __init__(self, curve):
+        self._curve = curve
+
+    def getParameterExtents(self):
+        _api('CurveEvaluator3D.getParameterExtents')
+        return True, 0.0, 1.0
+
+    def getPointAtParameter(self, parameter):
+        _api('CurveEvaluator3D.getPointAtParameter')
+        return True, Point3D(*self._curve._point(parameter))
+
+    def getPointsAtParameters(self, parameters):
+        _api('CurveEvaluator3D.getPointsAtParameters')
+        return True, [Point3D(*self._curve._point(t)) for t in parameters]
+
+    def getTangent(self, parameter):
+        _api('CurveEvaluator3D.getTangent')
+        return True, Vector3D(*self._curve._tangent(parameter))
+
+    def getTangents(self, parameters):
+        _api('CurveEvaluator3D.getTangents')
+        return True, [Vector3D(*self._curve._tangent(t)) for t in parameters]
+
+    def getLengthAtParameter(self, fromParameter, toParameter):
+        _api('CurveEvaluator3D.getLengthAtParameter')
+        return True, self._curve._len * abs(toParameter - fromParameter)
+
+
+# ---------- topology ----------
+
+class _List:
+    """Fusion-style read-only collection (count/item/iteration)."""
+    def __init__(self, name, items):
+        self._name  = name
+        self._items = items
+    @property
+    def count(self): return len(self._items)
+    def item(self, i):
+        _api(self._name + '.item')
+        return self._items[i]
+    def __iter__(self):
+        _api(self._name + '.__iter__')
+        return iter(self._items)
+    def __len__(self): return len(self._items)
+
+
+def _token(kind, body_id, i):
+    # Real entity tokens are long opaque strings; keep ours comparably long.
+    return f'/v4BAAEAAwAAAAAAAAAAAAAA{kind}{body_id:04d}{i:08d}AAAAAAAAAAAAAAAA'
+
+
+class BRepFace:
+    def __init__(self, body, idx, surf, sense, prange, periodic_u):
+        self._body       = body
+        self._idx        = idx
+        self._surf       = surf
+        self._sense      = sense
+        self._range      = prange
+        self._periodic_u = periodic_u
+        self._edges      = []
+        self._token      = _token('F', body._id, idx)
+        self._evaluator  = SurfaceEvaluator(self)
+
+    @classmethod
+    def cast(cls, obj): return obj if isinstance(obj, cls) else None
+
+    @property
+    def entityToken(self):
+        _api('BRepFace.entityToken')
+        return self._token
+    @property
+    def body(self):
+        _api('BRepFace.body')
+        return self._body
+    @property
+    def geometry(self):
+        _api('BRepFace.geometry')
+        return self._surf
+    @property
+    def evaluator(self):
+        _api('BRepFace.evaluator')
+        return self._evaluator
+    @property
+    def edges(self):
+        _api('BRepFace.edges')
+        return _List('BRepEdges', self._edges)
+    @property
+    def isParamReversed(self):
+        _api('BRepFace.isParamReversed')
+        return False
+    @property
+    def pointOnFace(self):
+        _api('BRepFace.pointOnFace')
+        r = self._range
+        return Point3D(*self._surf._point((r[0]+r[1])*0.5, (r[2]+r[3])*0.5))
+    @property
+    def isValid(self): return True
+
+
+class BRepEdge:
+    def __init__(self, body, idx, curve, faces, kind):
+        self._body      = body
+        self._idx       = idx
+        self._curve     = curve
+        self._faces     = faces
+        self._kind      = kind   # 'concave' / 'convex' as the kernel would report it
+        self._token     = _token('E', body._id, idx)
+        self._evaluator = CurveEvaluator3D(curve)
+
+    @classmethod
+    def cast(cls, obj): return obj if isinstance(obj, cls) else None
+
+    @property
+    def entityToken(self):
+        _api('BRepEdge.entityToken')
+        return self._token
+    @property
+    def body(self):
+        _api('BRepEdge.body')
+        return self._body
+    @property
+    def faces(self):
+        _api('BRepEdge.faces')
+        return _List('BRepFaces', self._faces)
+    @property
+    def geometry(self):
+        _api('BRepEdge.geometry')
+        return self._curve
+    @property
+    def evaluator(self):
+        _api('BRepEdge.evaluator')
+        return self._evaluator
+    @property
+    def length(self):
+        _api('BRepEdge.length')
+        return self._curve._len
+    @property
+    def isValid(self): return True
+
+
+class BRepBody:
+    _next_id = 0
+
+    def __init__(self, name='Body'):
+        BRepBody._next_id += 1
+        self._id    = BRepBody._next_id
+        self._faces = []
+        self._edges = []
+        self.name   = name
+        self._token = _token('B', self._id, 0)
+
+    @classmethod
+    def cast(cls, obj): return obj if isinstance(obj, cls) else None
+
+    @property
+    def entityToken(self):
+        _api('BRepBody.entityToken')
+        return self._token
+    @property
+    def faces(self):
+        _api('BRepBody.faces')
+        return _List('BRepFaces', self._faces)
+    @property
+    def edges(self):
+        _api('BRepBody.edges')
+        return _List('BRepEdges', self._edges)
+    @property
+    def concaveEdges(self):
+        _api('BRepBody.concaveEdges')
+        return _List('BRepEdges', [e for e in self._edges if e._kind == 'concave' and len(e._faces) == 2])
+    @property
+    def convexEdges(self):
+        _api('BRepBody.convexEdges')
+        return _List('BRepEdges', [e for e in self._edges if e._kind == 'convex' and len(e._faces) == 2])
+    @property
+    def area(self):
+        _api('BRepBody.area')
+        return float(len(self._faces))
+    @property
+    def isValid(self): return True
+    @property
+    def isSolid(self): return True
+    @property
+    def isVisible(self): return True
+
+    # -- construction (stub only) --
+
+    def add_face(self, surf, sense, prange, nurbs=False):
+        periodic_u = isinstance(surf, (Cylinder, Cone, Sphere, Torus))
+        if nurbs:
+            surf = NurbsSurface(surf)
+        face = BRepFace(self, len(self._faces), surf, sense, prange, periodic_u)
+        self._faces.append(face)
+        return face
+
+    def add_edge(self, curve, faces, kind):
+        edge = BRepEdge(self, len(self._edges), curve, list(faces), kind)
+        for f in faces:
+            f._edges.append(edge)
+        self._edges.append(edge)
+        return edge
+
+
+# ---------- application / events ----------
+
+class _Event:
+    def __init__(self): self._handlers = []
+    def add(self, handler):
+        self._handlers.append(handler)
+        return True
+    def remove(self, handler):
+        if handler in self._handlers:
+            self._handlers.remove(handler)
+        return True
+
+
+class _CustomEventArgs:
+    def __init__(self, info): self.additionalInfo = info
+
+
+class _Selections:
+    def __init__(self): self._items = []
+    def clear(self):
+        _api('Selections.clear')
+        self._items = []
+    def add(self, entity):
+        _api('Selections.add')
+        self._items.append(entity)
+        return True
+    def addCollection(self, collection):
+        _api('Selections.addCollection')
+        self._items.extend(collection)
+        return True
+    @property
+    def all(self):
+        _api('Selections.all')
+        col = ObjectCollection()
+        col._items = list(self._items)
+        return col
+    @all.setter
+    def all(self, collection):
+        _api('Selections.all')
+        self._items = list(collection)
+    @property
+    def count(self): return len(self._items)
+
+
+class _CommandDefinitions:
+    def itemById(self, _id): return None
+
+
+class _UserInterface:
+    def __init__(self):
+        self.activeSelections   = _Selections()
+        self.commandDefinitions = _CommandDefinitions()
+        self.commandTerminated  = _Event()
+    def messageBox(self, text, *_args):
+        raise RuntimeError(text)
+
+
+class _Viewport:
+    def refresh(self): pass
+
+
+class Application:
+    _instance = None
+
+    def __init__(self):
+        self.userInterface     = _UserInterface()
+        self.activeProduct     = None
+        self.activeDocument    = None
+        self.documents         = []
+        self.activeViewport    = _Viewport()
+        self.documentClosed    = _Event()
+        self.documentActivated = _Event()
+        self.log_lines         = []
+        self.echo              = False
+        self._custom           = {}
+        self._queue            = collections.deque()
+
+    @staticmethod
+    def get():
+        if Application._instance is None:
+            Application._instance = Application()
+        return Application._instance
+
+    def log(self, message, *_args):
+        self.log_lines.append(message)
+        if self.echo:
+            print(message)
+
+    def registerCustomEvent(self, eventId):
+        return self._custom.setdefault(eventId, _Event())
+
+    def unregisterCustomEvent(self, eventId):
+        return self._custom.pop(eventId, None) is not None
+
+    def fireCustomEvent(self, eventId, additionalInfo=''):
+        if eventId not in self._custom:
+            return False
+        self._queue.append((eventId, additionalInfo))
+        return True
+
+    def pump_events(self, limit=100000):
+        """Stub only: deliver queued custom events the way Fusion's idle loop would."""
+        n = 0
+        while self._queue and n < limit:
+            eventId, info = self._queue.popleft()
+            event = self._custom.get(eventId)
+            if event is None:
+                continue
+            for handler in list(event._handlers):
+                handler.notify(_CustomEventArgs(info))
+            n += 1
+        return n
+
+
+class _Handler:
+    def __init__(self): pass
+    def notify(self, args): pass
+
+
+class ValueInput:
+    @staticmethod
+    def createByString(s): return s
+    @staticmethod
+    def createByReal(v): return v
+
+
+# ---------- adsk.fusion odds and ends ----------
+
+class Design:
+    def __init__(self, bodies=(), occurrences=()):
+        self.rootComponent = Component(bodies, occurrences)
+
+    @classmethod
+    def cast(cls, obj): return obj if isinstance(obj, cls) else None
+
+
+class Component:
+    _count = 0
+    def __init__(self, bodies=(), occurrences=()):
+        Component._count += 1
+        self.id           = f'component-{Component._count}'
+        self._bodies      = list(bodies)
+        self._occurrences = list(occurrences)
+    @property
+    def bRepBodies(self):
+        _api('Component.bRepBodies')
+        return _List('BRepBodies', self._bodies)
+    @property
+    def allOccurrences(self): return _List('Occurrences', self._occurrences)
+    @property
+    def customGraphicsGroups(self):
+        if not hasattr(self, '_gfx'):
+            self._gfx = CustomGraphicsGroups()
+        return self._gfx
+
+
+class Occurrence:
+    """Stub only: an instance of component; bodies stand in for its body proxies."""
+    def __init__(self, component, bodies):
+        self.component = component
+        self._bodies   = list(bodies)
+    @property
+    def bRepBodies(self):
+        _api('Occurrence.bRepBodies')
+        return _List('BRepBodies', self._bodies)
+
+
+class CustomGraphicsGroups:
+    def __init__(self): self._groups = []
+    @property
+    def count(self): return len(self._groups)
+    def item(self, i):
+        _api('CustomGraphicsGroups.item')
+        return self._groups[i]
+    def add(self):
+        _api('CustomGraphicsGroups.add')
+        grp = CustomGraphicsGroup(self)
+        self._groups.append(grp)
+        return grp
+
+
+class CustomGraphicsGroup:
+    def __init__(self, owner):
+        self._owner    = owner
+        self.id        = ''
+        self.isVisible = True
+        self.isValid   = True
+        self.texts     = []
+    def addText(self, text, font, height, transform):
+        _api('CustomGraphicsGroup.addText')
+        txt = types.SimpleNamespace(text=text, transform=transform, isVisible=True,
+                                    billBoarding=None, isValid=True)
+        self.texts.append(txt)
+        return txt
+    def deleteMe(self):
+        _api('CustomGraphicsGroup.deleteMe')
+        self._owner._groups.remove(self)
+        self.isValid = False
+        return True
+
+
+def activate(bodies, occurrences=()):
+    """Stub only: make a Design holding bodies and occurrences the application's active product."""
+    design = Design(bodies, occurrences)
+    Application.get().activeProduct = design
+    return design
+
+
+CustomGraphicsBillBoardStyles = _Enum(ScreenBillBoardStyle=0)
+
+
+class CustomGraphicsBillBoard:
+    def __init__(self, anchor): self.anchorPoint = anchor
+    @staticmethod
+    def create(anchor): return CustomGraphicsBillBoard(anchor)
+
+
+# ---------- module installation ----------
+
+def install():
+    """Register fake adsk, adsk.core and adsk.fusion modules. Idempotent."""
+    if 'adsk' in sys.modules and getattr(sys.modules['adsk'], '_is_stub', False):
+        return sys.modules['adsk']
+
+    adsk = types.ModuleType('adsk')
+    core = types.ModuleType('adsk.core')
+    fusion = types.ModuleType('adsk.fusion')
+    adsk._is_stub = True
+    adsk.core, adsk.fusion = core, fusion
+    adsk.terminate = lambda: None
+    adsk.autoTerminate = lambda value: None
+
+    for name in ('Point2D', 'Point3D', 'Vector3D', 'BoundingBox2D', 'Matrix3D',
+                 'ObjectCollection', 'SurfaceTypes', 'Curve3DTypes',
+                 'CommandTerminationReason', 'Plane', 'Cylinder', 'Sphere',
+                 'Torus', 'Cone', 'EllipticalCylinder', 'EllipticalCone',
+                 'NurbsSurface', 'SurfaceEvaluator', 'Line3D', 'Arc3D',
+                 'CurveEvaluator3D', 'Application', 'ValueInput'):
+        setattr(core, name, globals()[name])
+    for name in ('CommandEventHandler', 'SelectionEventHandler',
+                 'InputChangedEventHandler', 'CommandCreatedEventHandler',
+                 'CustomEventHandler', 'ApplicationCommandEventHandler',
+                 'DocumentEventHandler'):
+        setattr(core, name, type(name, (_Handler,), {}))
+    core.Command = types.SimpleNamespace(cast=lambda obj: obj)
+
+    for name in ('BRepBody', 'BRepFace', 'BRepEdge', 'Design', 'Component', 'Occurrence',
+                 'CustomGraphicsBillBoard', 'CustomGraphicsBillBoardStyles'):
+        setattr(fusion, name, globals()[name])
+
+    sys.modules['adsk'] = adsk
+    sys.modules['adsk.core'] = core
+    sys.modules['adsk.fusion'] = fusion
+    return adsk
+
+
+# ---------- synthetic bodies ----------
+
+_E = ((1.0, 0.0, 0.0), (0.0, 1.0, 0.0), (0.0, 0.0, 1.0))
+
+
+def rounded_boxes(count=1, size=(4.0, 3.0, 2.0), radius=0.5, nurbs=False):
+    """
+    One body holding `count` disjoint boxes, every edge filleted with a
+    cylinder and every corner closed with a sphere octant: 26 faces, 48 edges
+    per box, all edges tangent.  nurbs reports the blends as NurbsSurface.
+    """
+    body = BRepBody('RoundedBoxes')
+    H = [s / 2.0 for s in size]
+    r = radius
+    for b in range(count):
+        off = (b * (size[0] + 2.0*r), 0.0, 0.0)
+        planes, cyls, spheres = {}, {}, {}
+        for k in range(3):
+            i, j = (k + 1) % 3, (k + 2) % 3
+            for s in (1, -1):
+                n = _mul(_E[k], s)
+                org = _add(off, _mul(_E[k], s*H[k]))
+                u = _E[i]
+                rng = (-(H[i]-r), H[i]-r, -(H[j]-r), H[j]-r)
+                planes[k, s] = body.add_face(Plane(org, n, u), 1, rng)
+        for k in range(3):
+            i, j = (k + 1) % 3, (k + 2) % 3
+            for si in (1, -1):
+                for sj in (1, -1):
+                    org = _add(off, _add(_mul(_E[i], si*(H[i]-r)), _mul(_E[j], sj*(H[j]-r))))
+                    th = si * sj * math.pi / 2.0
+                    rng = (min(0.0, th), max(0.0, th), -(H[k]-r), H[k]-r)
+                    cyls[k, si, sj] = body.add_face(
+                        Cylinder(org, _E[k], r, _mul(_E[i], si)), 1, rng, nurbs)
+        for s0 in (1, -1):
+            for s1 in (1, -1):
+                for s2 in (1, -1):
+                    c = _add(off, (s0*(H[0]-r), s1*(H[1]-r), s2*(H[2]-r)))
+                    th = s0 * s1 * s2 * math.pi / 2.0
+                    rng = (min(0.0, th), max(0.0, th), 0.0, math.pi / 2.0)
+                    spheres[s0, s1, s2] = body.add_face(
+                        Sphere(c, r, _mul(_E[0], s0), _mul(_E[2], s2)), 1, rng, nurbs)
+        for (k, si, sj), cyl in cyls.items():
+            i, j = (k + 1) % 3, (k + 2) % 3
+            a = _add(off, _mul(_E[k], -(H[k]-r)))
+            b_ = _add(off, _mul(_E[k], H[k]-r))
+            for plane, base in ((planes[i, si], _add(_mul(_E[i], si*H[i]), _mul(_E[j], sj*(H[j]-r)))),
+                                (planes[j, sj], _add(_mul(_E[i], si*(H[i]-r)), _mul(_E[j], sj*H[j])))):
+                body.add_edge(Line3D(_add(a, base), _add(b_, base)), (plane, cyl), 'convex')
+            for sk in (1, -1):
+                signs = [0, 0, 0]
+                signs[k], signs[i], signs[j] = sk, si, sj
+                sph = spheres[tuple(signs)]
+                c = _add(off, tuple(signs[q]*(H[q]-r) for q in range(3)))
+                arc = Arc3D(c, _E[k], _mul(_E[i], si), r, si * sj * math.pi / 2.0)
+                body.add_edge(arc, (cyl, sph), 'convex')
+    return body
+
+
+def pocket_plate(nx=4, ny=4, pocket=(2.0, 1.5), depth=0.8, radius=0.3,
+                 pitch=3.0, thickness=2.0):
+    """
+    Plate with an nx x ny array of pockets.  Each pocket has four walls, four
+    concave vertical corner fillets and a floor: sharp convex rim, tangent
+    wall-fillet edges, sharp concave floor edges.
+    """
+    body = BRepBody('PocketPlate')
+    W, D, T = nx * pitch, ny * pitch, thickness
+    p, q, h, r = pocket[0], pocket[1], depth, radius
+    top    = body.add_face(Plane((0.0, 0.0, 0.0), (0, 0, 1), (1, 0, 0)), 1, (0.0, W, 0.0, D))
+    bottom = body.add_face(Plane((0.0, 0.0, -T), (0, 0, -1), (1, 0, 0)), 1, (0.0, W, -D, 0.0))
+    sides = [
+        body.add_face(Plane((0.0, 0.0, 0.0), (0, -1, 0), (1, 0, 0)), 1, (0.0, W, -T, 0.0)),
+        body.add_face(Plane((W, 0.0, 0.0), (1, 0, 0), (0, 1, 0)), 1, (0.0, D, -T, 0.0)),
+        body.add_face(Plane((W, D, 0.0), (0, 1, 0), (-1, 0, 0)), 1, (0.0, W, -T, 0.0)),
+        body.add_face(Plane((0.0, D, 0.0), (-1, 0, 0), (0, -1, 0)), 1, (0.0, D, -T, 0.0)),
+    ]
+    corners = [(0.0, 0.0), (W, 0.0), (W, D), (0.0, D)]
+    for i in range(4):
+        c0, c1 = corners[i], corners[(i + 1) % 4]
+        body.add_edge(Line3D((c0[0], c0[1], 0.0), (c1[0], c1[1], 0.0)), (top, sides[i]), 'convex')
+        body.add_edge(Line3D((c0[0], c0[1], -T), (c1[0], c1[1], -T)), (bottom, sides[i]), 'convex')
+        body.add_edge(Line3D((c1[0], c1[1], 0.0), (c1[0], c1[1], -T)), (sides[i], sides[(i + 1) % 4]), 'convex')
+
+    for ix in range(nx):
+        for iy in range(ny):
+            x0 = ix * pitch + (pitch - p) / 2.0
+            y0 = iy * pitch + (pitch - q) / 2.0
+            floor = body.add_face(Plane((x0, y0, -h), (0, 0, 1), (1, 0, 0)), 1, (0.0, p, 0.0, q))
+            walls = [
+                body.add_face(Plane((x0, y0, 0.0), (0, 1, 0), (1, 0, 0)), 1, (r, p - r, 0.0, h)),
+                body.add_face(Plane((x0 + p, y0, 0.0), (-1, 0, 0), (0, 1, 0)), 1, (r, q - r, 0.0, h)),
+                body.add_face(Plane((x0, y0 + q, 0.0), (0, -1, 0), (1, 0, 0)), 1, (r, p - r, -h, 0.0)),
+                body.add_face(Plane((x0, y0, 0.0), (1, 0, 0), (0, 1, 0)), 1, (r, q - r, -h, 0.0)),
+            ]
+            # corner fillets in the same order as the pocket corners
+            ccs = [(x0 + r, y0 + r, -1, -1), (x0 + p - r, y0 + r, 1, -1),
+                   (x0 + p - r, y0 + q - r, 1, 1), (x0 + r, y0 + q - r, -1, 1)]
+            cyls = []
+            for cx, cy, dx, dy in ccs:
+                th = dx * dy * math.pi / 2.0
+                cyls.append(body.add_face(
+                    Cylinder((cx, cy, 0.0), (0, 0, 1), r, (dx, 0, 0)), -1,
+                    (min(0.0, th), max(0.0, th), -h, 0.0)))
+            # walls: 0 front (y=y0), 1 right (x=x0+p), 2 back (y=y0+q), 3 left (x=x0)
+            wall_ends = [((x0 + r, y0), (x0 + p - r, y0)), ((x0 + p, y0 + r), (x0 + p, y0 + q - r)),
+                         ((x0 + p - r, y0 + q), (x0 + r, y0 + q)), ((x0, y0 + q - r), (x0, y0 + r))]
+            for w in range(4):
+                a, b = wall_ends[w]
+                body.add_edge(Line3D((a[0], a[1], 0.0), (b[0], b[1], 0.0)), (top, walls[w]), 'convex')
+                body.add_edge(Line3D((a[0], a[1], -h), (b[0], b[1], -h)), (floor, walls[w]), 'concave')
+                # wall w runs from corner w to corner w+1
+                body.add_edge(Line3D((a[0], a[1], -h), (a[0], a[1], 0.0)), (cyls[w], walls[w]), 'concave')
+                body.add_edge(Line3D((b[0], b[1], -h), (b[0], b[1], 0.0)), (walls[w], cyls[(w + 1) % 4]), 'concave')
+            for (cx, cy, dx, dy), cyl in zip(ccs, cyls):
+                th = dx * dy * math.pi / 2.0
+                for z, other, kind in ((0.0, top, 'convex'), (-h, floor, 'concave')):
+                    body.add_edge(Arc3D((cx, cy, z), (0, 0, 1), (dx, 0, 0), r, th), (other, cyl), kind)
+    return body
+
+
+def _grid_profile(periods, top, bottom, height, radius):
+    """Cross-section (x, z) of a ribbed sheet: tangent chain of lines and quarter arcs."""
+    r, H = radius, height
+    segs = []
+    x = 0.0
+    half = math.pi / 2.0
+    for _ in range(periods):
+        segs.append(('line', (x, H), (x + top, H)))
+        x += top
+        segs.append(('arc', (x, H - r), half, 0.0, 1))
+        if H - 2*r > 1e-9:
+            segs.append(('line', (x + r, H - r), (x + r, r)))
+        segs.append(('arc', (x + 2*r, r), math.pi, 3*half, -1))
+        x += 2*r
+        segs.append(('line', (x, 0.0), (x + bottom, 0.0)))
+        x += bottom
+        segs.append(('arc', (x, r), 3*half, 2*math.pi, -1))
+        if H - 2*r > 1e-9:
+            segs.append(('line', (x + r, r), (x + r, H - r)))
+        segs.append(('arc', (x + 2*r, H - r), math.pi, half, 1))
+        x += 2*r
+    return segs
+
+
+def fillet_grid(n=4, m=4, top=1.0, bottom=1.0, height=2.0, radius=0.4,
+                seg_len=1.0, nurbs=False):
+    """
+    Open ribbed sheet: n periods of (top, convex fillet, wall, concave fillet,
+    bottom, concave fillet, wall, convex fillet) strips, each strip split
+    into m co-surface (G2) segments along y.  8*n*m faces.
+    With height == 2*radius the walls vanish and convex fillets run
+    straight into concave ones (6*n*m faces).
+    """
+    body = BRepBody('FilletGrid')
+    segs = _grid_profile(n, top, bottom, height, radius)
+    grid = []
+    for seg in segs:
+        row = []
+        for j in range(m):
+            y0, y1 = j * seg_len, (j + 1) * seg_len
+            if seg[0] == 'line':
+                (x0, z0), (x1, z1) = seg[1], seg[2]
+                t = _unit((x1 - x0, 0.0, z1 - z0))
+                length = math.hypot(x1 - x0, z1 - z0)
+                srf = Plane((x0, 0.0, z0), (-t[2], 0.0, t[0]), t)
+                row.append(body.add_face(srf, 1, (0.0, length, y0, y1)))
+            else:
+                (cx, cz), a0, a1, sense = seg[1], seg[2], seg[3], seg[4]
+                srf = Cylinder((cx, 0.0, cz), (0, -1, 0), radius, (1, 0, 0))
+                row.append(body.add_face(srf, sense, (min(a0, a1), max(a0, a1), -y1, -y0), nurbs))
+        grid.append(row)
+
+    def section(seg, y):
+        if seg[0] == 'line':
+            (x0, z0), (x1, z1) = seg[1], seg[2]
+            return Line3D((x0, y, z0), (x1, y, z1))
+        (cx, cz), a0, a1 = seg[1], seg[2], seg[3]
+        return Arc3D((cx, y, cz), (0, -1, 0), (math.cos(a0), 0.0, math.sin(a0)), radius, a1 - a0)
+
+    def kind(seg):
+        return 'concave' if seg[0] == 'arc' and seg[4] < 0 else 'convex'
+
+    def end_point(seg):
+        if seg[0] == 'line':
+            return seg[2]
+        (cx, cz), a1 = seg[1], seg[3]
+        return (cx + radius*math.cos(a1), cz + radius*math.sin(a1))
+
+    for k, seg in enumerate(segs):
+        for j in range(m):
+            y0, y1 = j * seg_len, (j + 1) * seg_len
+            face = grid[k][j]
+            if k + 1 < len(segs):
+                px, pz = end_point(seg)
+                kk = kind(segs[k + 1]) if seg[0] == 'line' else kind(seg)
+                body.add_edge(Line3D((px, y0, pz), (px, y1, pz)), (face, grid[k + 1][j]), kk)
+            if j + 1 < m:
+                body.add_edge(section(seg, y1), (face, grid[k][j + 1]), kind(seg))
+            if j == 0:
+                body.add_edge(section(seg, y0), (face,), 'convex')
+            if j == m - 1:
+                body.add_edge(section(seg, y1), (face,), 'convex')
+        if k == 0:
+            for j in range(m):
+                x0, z0 = seg[1]
+                body.add_edge(Line3D((x0, j*seg_len, z0), (x0, (j+1)*seg_len, z0)), (grid[0][j],), 'convex')
+        if k == len(segs) - 1:
+            px, pz = end_point(seg)
+            for j in range(m):
+                body.add_edge(Line3D((px, j*seg_len, pz), (px, (j+1)*seg_len, pz)), (grid[k][j],), 'convex')
+    return body
+
+
+def cone_stack(count=1, radius=1.0, half_angle=math.pi / 6.0, height=0.8, band=0.0):
+    """
+    One body holding `count` disjoint revolved diamonds: two cone frustums
+    joined at their common base circle of `radius`, narrowing up and down
+    at half_angle to flat caps `height` away. The two cones have opposite
+    axes, so the equator is a sharp convex edge (normal dot cos 2*half_angle).
+    band > 0 puts a cylinder of that height between them instead.
+    4 faces and 3 edges per diamond, 5 and 4 with a band; all edges convex.
+    """
+    body = BRepBody('ConeStack')
+    R, h, t = radius, height, math.tan(half_angle)
+    full = 2.0 * math.pi
+    for b in range(count):
+        cx = b * 3.0 * R
+        zs = (band / 2.0, -band / 2.0)
+        cones, caps = [], []
+        for z0, s in zip(zs, (1, -1)):
+            c = (cx, 0.0, z0)
+            cones.append(body.add_face(Cone(c, (0, 0, s), R, half_angle, (1, 0, 0)), 1,
+                                       (0.0, full, 0.0, h)))
+            top = (cx, 0.0, z0 + s * h)
+            caps.append(body.add_face(Plane(top, (0, 0, s), (1, 0, 0)), 1,
+                                      (-(R - h*t), R - h*t, -(R - h*t), R - h*t)))
+            body.add_edge(Arc3D(top, (0, 0, 1), (1, 0, 0), R - h*t, full),
+                          (caps[-1], cones[-1]), 'convex')
+        if band > 0.0:
+            cyl = body.add_face(Cylinder((cx, 0.0, 0.0), (0, 0, 1), R, (1, 0, 0)), 1,
+                                (0.0, full, -band / 2.0, band / 2.0))
+            for z0, cone in zip(zs, cones):
+                body.add_edge(Arc3D((cx, 0.0, z0), (0, 0, 1), (1, 0, 0), R, full),
+                              (cone, cyl), 'convex')
+        else:
+            body.add_edge(Arc3D((cx, 0.0, 0.0), (0, 0, 1), (1, 0, 0), R, full),
+                          (cones[0], cones[1]), 'convex')
+    return body
@@ -0,0 +1,359 @@
+"""
+Benchmark of the FaceFloodFill engine outside Fusion, on synthetic bodies
+from FaceFloodFill_adsk_stub.
+
+Usage:
+    python FaceFloodFill_bench.py [--shape grid|boxes|pockets|cones] [--size N]
+                                  [--nurbs] [--seeds K] [--tol-deg DEG]
+                                  [--latency-us US] [--workers N] [--precisions]
+                                  [--analytic] [--reference] [--json PATH]
+
+--size scales the body: grid gives 8*N*N faces (N=112 is about 100k faces),
+boxes 26*N faces, pockets 9*N*N+6 faces and cones 4*N faces.
+--latency-us busy-waits on every counted API call to approximate the cost
+of a round trip into Fusion.
+--workers also times the API-free G2 stage (g2_metrics_from_samples) on the
+extracted samples of the body's tangent edges, in one process and mapped over
+N worker processes.
+--precisions also compares the fast, balanced and exact edge sampling:
+time, evaluator calls and edge classes that differ from exact.
+--analytic also compares the graph build with and without the closed-form
+classification of edges between analytic faces, on the body and on mirrored
+cones (revolved diamonds), whose sharp equator must not pass for one surface.
+--reference also times the batched edge normal dots and the bulk G2 test
+(NumPy only) against the per-edge loops they replaced.
+
+For every phase the wall time and the number of API calls are reported,
+with the three most frequent calls.
+
+261016: First version.
+"""
+
+import argparse
+import concurrent.futures
+import json
+import math
+import multiprocessing
+import os
+import random
+import sys
+import time
+from array import array
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import FaceFloodFill_adsk_stub as stub
+stub.install()
+import FaceFloodFill as ff
+
+
+MODES = ('concave', 'convex', 'tangent')
+
+
+def make_body(shape, size, nurbs):
+    if shape == 'grid':
+        return stub.fillet_grid(size, size, nurbs=nurbs)
+    if shape == 'boxes':
+        return stub.rounded_boxes(size, nurbs=nurbs)
+    if shape == 'pockets':
+        return stub.pocket_plate(size, size)
+    if shape == 'cones':
+        return stub.cone_stack(size)
+    raise ValueError(f'Unknown shape: {shape}')
+
+
+def _phase(results, name, fn):
+    stub.reset_counts()
+    t0  = time.perf_counter()
+    out = fn()
+    dt  = time.perf_counter() - t0
+    calls = dict(stub.API_CALLS)
+    results.append({'phase': name, 'seconds': dt,
+                    'api_calls': sum(calls.values()), 'by_call': calls})
+    return out
+
+
+def run_bench(body, n_seeds, tol, workers=0):
+    """List of {'phase', 'seconds', 'api_calls', 'by_call'} for one body."""
+    ff._shared.clear()
+    ff.drop_document_caches(set())
+    stub.activate([body])
+    faces = list(body.faces)
+    seeds = random.Random(0).sample(faces, min(n_seeds, len(faces)))
+    results = []
+
+    def graph():
+        g = ff.build_face_graph(body)
+        ff._keep_graph(body.entityToken, ff._body_cache(body), g)
+        return g
+
+    _phase(results, 'build_face_graph', graph)
+    classes = _phase(results, 'classes', lambda: ff._classes_for(body, tol))
+    for mode in MODES:
+        _phase(results, f'flood_fill {mode}',
+               lambda: [ff.flood_fill(s, mode, tol) for s in seeds])
+    def labels():
+        classes.regions = ff.label_regions(classes)
+    _phase(results, 'label_regions', labels)
+    _phase(results, 'region_faces',
+           lambda: [ff.region_faces(s, m, tol) for m in MODES for s in seeds])
+    # Cold, UI-free path: extraction, classification and labelling from scratch
+    def batch():
+        g = ff.build_face_graph(body, face_table={})
+        return [ff.flood_fill_batch(body, seeds, m, tol, graph=g) for m in MODES]
+    _phase(results, 'flood_fill_batch (cold)', batch)
+    if workers:
+        _bench_g2_numeric(results, body, tol, workers)
+    return results
+
+
+def _bench_g2_numeric(results, body, tol, workers, chunk=256):
+    graph   = ff.build_face_graph(body, face_table={})
+    tangent = tangent_edges(graph, tol)
+    chunks  = _phase(results, 'g2 extract',
+                     lambda: [ff.extract_g2_samples(graph, tangent[i:i + chunk])
+                              for i in range(0, len(tangent), chunk)])
+    serial  = _phase(results, 'g2 numeric (1 process)',
+                     lambda: [ff.g2_metrics_from_samples(c) for c in chunks])
+    # Forked workers inherit the stubbed adsk modules
+    ctx = multiprocessing.get_context('fork')
+    with concurrent.futures.ProcessPoolExecutor(workers, mp_context=ctx) as pool:
+        list(pool.map(int, range(workers)))  # start the workers outside the timing
+        parallel = _phase(results, f'g2 numeric ({workers} processes)',
+                          lambda: g2_metrics_parallel(chunks, pool))
+    if parallel != serial:
+        raise RuntimeError('Parallel G2 metrics differ from the serial ones')
+
+
+def g2_metrics_parallel(chunks, executor):
+    """
+    ff.g2_metrics_from_samples of every G2Samples in chunks, mapped over executor
+    (a concurrent.futures executor). Results are in chunk order. The chunks
+    are pickled to the workers of a ProcessPoolExecutor; use a fork context
+    there, since the workers need FaceFloodFill without importing adsk.
+    """
+    return list(executor.map(ff.g2_metrics_from_samples, chunks))
+
+
+def tangent_edges(graph, tangent_tol_cos):
+    """Indices of the edges of graph that are G1 tangent at tangent_tol_cos."""
+    n_dot = graph.n_dot
+    return [ei for ei in range(len(n_dot)) if abs(n_dot[ei]) >= tangent_tol_cos]
+
+
+def _edge_normal_dots(edges, faces, edge_faces):
+    """ff._edge_normal_dots_steps of every edge, run to completion."""
+    return ff._drain(ff._edge_normal_dots_steps(edges, faces, edge_faces))
+
+
+def _edge_normal_dots_per_edge(edges, faces, edge_faces):
+    """
+    Reference version of _edge_normal_dots: the original per-edge loop with
+    two getNormalAtPoint calls per edge. Kept for compare_edge_normal_dots.
+    """
+    nan   = float('nan')
+    n_dot = array('d', [nan]) * len(edges)
+    for ei, edge in enumerate(edges):
+        f1, f2 = edge_faces[2*ei], edge_faces[2*ei + 1]
+        if f2 < 0:
+            continue
+        ev = edge.evaluator
+        _, t0, t1 = ev.getParameterExtents()
+        _, pt     = ev.getPointAtParameter((t0 + t1) / 2.0)
+        ok1, n1   = faces[f1].evaluator.getNormalAtPoint(pt)
+        ok2, n2   = faces[f2].evaluator.getNormalAtPoint(pt)
+        if ok1 and ok2:
+            n_dot[ei] = n1.x*n2.x + n1.y*n2.y + n1.z*n2.z
+    return n_dot
+
+
+def compare_edge_normal_dots(body):
+    """
+    Time _edge_normal_dots against the per-edge loop on body.
+    Returns (batched seconds, per-edge seconds, max abs difference of the dots).
+    """
+    edges = list(body.edges)
+    faces = list(body.faces)
+    index = {f.entityToken: i for i, f in enumerate(faces)}
+    edge_faces = ff._drain(ff._edge_faces_steps(edges, index))
+
+    t0 = time.perf_counter()
+    batched = _edge_normal_dots(edges, faces, edge_faces)
+    t1 = time.perf_counter()
+    per_edge = _edge_normal_dots_per_edge(edges, faces, edge_faces)
+    t2 = time.perf_counter()
+
+    diff = max((abs(a - b) for a, b in zip(batched, per_edge) if a == a and b == b),
+               default=0.0)
+    return t1 - t0, t2 - t1, diff
+
+
+def g2_edge_mask(graph, edge_indices, tangent_tol_cos):
+    """
+    G2 decision of ff._is_g2_edge for the edges edge_indices of graph (tangent
+    edges with two faces), as a NumPy bool array. Unsampled edges are sampled
+    in bulk and their metrics kept on the graph. Requires numpy.
+    """
+    np = ff.np
+    graph.sample_g2(edge_indices)
+    idx = np.asarray(edge_indices, dtype=np.intp)
+    return ((np.frombuffer(graph.g2_state, dtype=np.uint8)[idx] == ff._G2_SAMPLED)
+            & (np.frombuffer(graph.g2_ratio, dtype=np.float64)[idx] <= ff.G2_CURV_RATIO)
+            & (np.frombuffer(graph.g2_dir, dtype=np.float64)[idx] >= tangent_tol_cos))
+
+
+def compare_g2_edges(body, tangent_tol_cos):
+    """
+    Time g2_edge_mask against ff._is_g2_edge on the tangent edges of body.
+    Returns (bulk seconds, scalar seconds, tokens of edges where they disagree).
+    """
+    graph   = ff.build_face_graph(body, face_table={})
+    tangent = tangent_edges(graph, tangent_tol_cos)
+
+    t0 = time.perf_counter()
+    mask = g2_edge_mask(graph, tangent, tangent_tol_cos).tolist()
+    t1 = time.perf_counter()
+    scalar = []
+    for ei in tangent:
+        f1, f2 = graph.edge_faces[2*ei], graph.edge_faces[2*ei + 1]
+        scalar.append(ff._is_g2_edge(graph.edges[ei], graph.faces[f1], graph.faces[f2],
+                                     tangent_tol_cos))
+    t2 = time.perf_counter()
+
+    diff = [graph.edges[ei].entityToken for ei, a, b in zip(tangent, mask, scalar) if a != b]
+    return t1 - t0, t2 - t1, diff
+
+
+def compare_precisions(body, tangent_tol_cos):
+    """
+    Classify the edges of body at every precision of ff.PRECISIONS, G2 included,
+    and compare each with 'exact'. Resets ff._perf. Returns {precision: {...}}
+    with 'seconds' and 'calls' (evaluator calls) of graph build and G2
+    sampling, the 'tangent' and 'g2' edge counts, and 'disagree', the number
+    of edges whose class differs from the exact one, of 'edges'.
+    """
+    out = {}
+    ref = None
+    for precision in reversed(ff.PRECISIONS):  # exact first, as the reference
+        ff._perf.reset()
+        t0      = time.perf_counter()
+        graph   = ff.build_face_graph(body, face_table={}, precision=precision)
+        classes = graph.classes(tangent_tol_cos)
+        classes.resolve_g2()
+        seconds = time.perf_counter() - t0
+        cls = classes.edge_class
+        if ref is None:
+            ref = cls
+        out[precision] = {
+            'seconds':  seconds,
+            'calls':    sum(ff._perf.calls.values()),
+            'tangent':  sum(1 for c in cls if c & ff.EDGE_TANGENT),
+            'g2':       sum(1 for c in cls if c & ff.EDGE_G2),
+            'disagree': sum(1 for a, b in zip(cls, ref) if a != b),
+            'edges':    len(cls)}
+    ff._perf.reset()
+    return out
+
+
+def compare_analytic_edges(body, tangent_tol_cos):
+    """
+    Time ff.build_face_graph with and without the analytic fast path on body,
+    G2 sampling included. Resets ff._perf. Returns (analytic seconds, sampled
+    seconds, analytic evaluator calls, sampled evaluator calls, tokens of
+    edges whose class differs).
+    """
+    runs = []
+    for analytic in (True, False):
+        ff._perf.reset()
+        t0      = time.perf_counter()
+        graph   = ff.build_face_graph(body, face_table={}, analytic=analytic)
+        classes = graph.classes(tangent_tol_cos)
+        classes.resolve_g2()
+        runs.append((time.perf_counter() - t0, sum(ff._perf.calls.values()), classes))
+    ff._perf.reset()
+    (t_a, calls_a, fast), (t_s, calls_s, ref) = runs
+    diff = [ref.graph.edges[ei].entityToken
+            for ei, (a, b) in enumerate(zip(fast.edge_class, ref.edge_class)) if a != b]
+    return t_a, t_s, calls_a, calls_s, diff
+
+
+def report_precisions(body, tol):
+    rows = compare_precisions(body, tol)
+    print(f'{"precision":<12}{"ms":>10}{"eval calls":>12}{"tangent":>9}{"g2":>7}{"disagree":>10}')
+    for name, r in rows.items():
+        print(f'{name:<12}{r["seconds"]*1000:>10.1f}{r["calls"]:>12}{r["tangent"]:>9}{r["g2"]:>7}'
+              f'{r["disagree"]:>5} ({100.0 * r["disagree"] / max(1, r["edges"]):.2f}%)')
+    return rows
+
+
+def report_analytic(body, tol):
+    t_a, t_s, calls_a, calls_s, diff = compare_analytic_edges(body, tol)
+    print(f'analytic fast path: {t_a*1000:.1f} ms, {calls_a} calls; '
+          f'sampled: {t_s*1000:.1f} ms, {calls_s} calls; {len(diff)} edges differ')
+    mirrored = 0
+    for cones in (stub.cone_stack(2), stub.cone_stack(2, band=0.5)):
+        stub.activate([cones])
+        mirrored += len(compare_analytic_edges(cones, tol)[4])
+    stub.activate([body])
+    print(f'mirrored cones: {mirrored} edges differ')
+    return {'analytic_seconds': t_a, 'sampled_seconds': t_s, 'analytic_calls': calls_a,
+            'sampled_calls': calls_s, 'disagree': len(diff), 'mirrored_cones_disagree': mirrored}
+
+
+def report_reference(body, tol):
+    t_b, t_e, dot_diff = compare_edge_normal_dots(body)
+    print(f'edge normal dots: batched {t_b*1000:.1f} ms, per edge {t_e*1000:.1f} ms, '
+          f'max difference {dot_diff:.2e}')
+    out = {'dots_batched_seconds': t_b, 'dots_per_edge_seconds': t_e, 'dots_max_diff': dot_diff}
+    if ff.np is not None:
+        t_m, t_s, diff = compare_g2_edges(body, tol)
+        print(f'G2 test: bulk {t_m*1000:.1f} ms, per edge {t_s*1000:.1f} ms, '
+              f'{len(diff)} edges differ')
+        out.update(g2_bulk_seconds=t_m, g2_per_edge_seconds=t_s, g2_disagree=len(diff))
+    return out
+
+
+def report(results):
+    print(f'{"phase":<26}{"ms":>10}{"api calls":>12}  top calls')
+    for r in results:
+        top = sorted(r['by_call'].items(), key=lambda kv: -kv[1])[:3]
+        top = ', '.join(f'{k} {v}' for k, v in top)
+        print(f'{r["phase"]:<26}{r["seconds"]*1000:>10.1f}{r["api_calls"]:>12}  {top}')
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    p.add_argument('--shape', choices=('grid', 'boxes', 'pockets', 'cones'), default='grid')
+    p.add_argument('--size', type=int, default=10)
+    p.add_argument('--nurbs', action='store_true')
+    p.add_argument('--seeds', type=int, default=20)
+    p.add_argument('--tol-deg', type=float, default=0.1)
+    p.add_argument('--latency-us', type=float, default=0.0)
+    p.add_argument('--workers', type=int, default=0)
+    p.add_argument('--precisions', action='store_true')
+    p.add_argument('--analytic', action='store_true')
+    p.add_argument('--reference', action='store_true')
+    p.add_argument('--json', help='Also write the results to this file')
+    args = p.parse_args(argv)
+
+    t0   = time.perf_counter()
+    body = make_body(args.shape, args.size, args.nurbs)
+    print(f'{args.shape} size {args.size}: {len(body._faces)} faces, {len(body._edges)} edges'
+          f' (generated in {time.perf_counter() - t0:.2f} s)')
+    tol = math.cos(math.radians(args.tol_deg))
+    stub.set_latency(args.latency_us * 1e-6)
+    results = run_bench(body, args.seeds, tol, args.workers)
+    stub.set_latency(0.0)
+    report(results)
+    precisions = report_precisions(body, tol) if args.precisions else None
+    analytic   = report_analytic(body, tol) if args.analytic else None
+    reference  = report_reference(body, tol) if args.reference else None
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'shape': args.shape, 'size': args.size, 'nurbs': args.nurbs,
+                       'faces': len(body._faces), 'edges': len(body._edges),
+                       'results': results, 'precisions': precisions,
+                       'analytic': analytic, 'reference': reference}, f, indent=1)
+
+
+if __name__ == '__main__':
+    main()